@@ -0,0 +1,242 @@
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+from fastapi import HTTPException, Request
+from config import settings
+
+class TokenBucket:
+    """Classic token bucket: holds up to capacity tokens, refilled at rate per second"""
+
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, cost: float) -> float:
+        """Take cost tokens. Returns 0 on success, else seconds until they are available"""
+        self._refill(time.monotonic())
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        if cost > self.capacity or self.rate <= 0:
+            return math.inf
+        return (cost - self.tokens) / self.rate
+
+    def debit(self, cost: float) -> None:
+        """Take cost tokens unconditionally; a negative balance delays later takes"""
+        self._refill(time.monotonic())
+        self.tokens -= cost
+
+
+class Admission(NamedTuple):
+    admitted: bool
+    stages: Tuple[str, ...] = ()
+    retry_after: int = 0
+    reason: str = ''
+
+
+class AdmissionController:
+    """Per-client token buckets plus a concurrency budget per cost class (stage).
+
+    State is per worker process, so limits apply per worker; see per_worker().
+    """
+
+    # Cost classes charged up front for each route. OCR, and the LLM call of a stored
+    # analysis's explanation, are charged only when they actually run. The last field
+    # marks routes that honour ?explain=, whose LLM call can be skipped or deferred.
+    ROUTE_CLASSES = (
+        ('POST', re.compile(r'^/analyze/text$'), ('text', 'llm'), True),
+        ('POST', re.compile(r'^/analyze/resume$'), ('pdf', 'llm'), True),
+        ('POST', re.compile(r'^/match/jobs$'), ('pdf',), False),
+        ('POST', re.compile(r'^/match/jobs/[^/]+/explanation$'), ('pdf', 'llm'), False),
+        ('PUT', re.compile(r'^/match/jobs$'), ('index',), False),
+    )
+
+    def __init__(self, costs: Dict[str, float], concurrency: Dict[str, int],
+                 bucket_capacity: float, bucket_rate: float, stage_retry_after: int = 2,
+                 max_clients: int = 10000, enabled: bool = True):
+        self.costs = costs
+        self.concurrency = concurrency
+        self.bucket_capacity = bucket_capacity
+        self.bucket_rate = bucket_rate
+        self.stage_retry_after = stage_retry_after
+        self.max_clients = max_clients
+        self.enabled = enabled
+        self.active: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {}
+        self._buckets: 'OrderedDict[str, TokenBucket]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def classify(self, method: str, path: str, explain: Optional[str] = None) -> Optional[Tuple[str, ...]]:
+        for route_method, pattern, classes, honours_explain in self.ROUTE_CLASSES:
+            if method == route_method and pattern.match(path):
+                # Score-only and deferred analyses make no LLM call up front
+                if honours_explain and explain in ('false', 'lazy'):
+                    classes = tuple(c for c in classes if c != 'llm')
+                return classes
+        return None
+
+    def _bucket(self, client_id: str) -> TokenBucket:
+        bucket = self._buckets.get(client_id)
+        if bucket is None:
+            bucket = TokenBucket(self.bucket_capacity, self.bucket_rate)
+            self._buckets[client_id] = bucket
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_id)
+        return bucket
+
+    def _reject(self, stage: str, retry_after: float, reason: str) -> Admission:
+        self.rejected[stage] = self.rejected.get(stage, 0) + 1
+        retry = int(math.ceil(retry_after)) if math.isfinite(retry_after) else 60
+        return Admission(admitted=False, retry_after=max(retry, 1), reason=reason)
+
+    def try_acquire(self, client_id: str, stages: Tuple[str, ...]) -> Admission:
+        """Reserve a concurrency slot in every stage and charge the client's bucket"""
+        if not self.enabled:
+            return Admission(admitted=True)
+
+        with self._lock:
+            for stage in stages:
+                if self.active.get(stage, 0) >= self.concurrency[stage]:
+                    return self._reject(stage, self.stage_retry_after,
+                                        f"Server is busy ({stage}), please retry later")
+
+            wait = self._bucket(client_id).take(sum(self.costs[stage] for stage in stages))
+            if wait > 0:
+                return self._reject('rate_limit', wait, "Too many requests, please slow down")
+
+            for stage in stages:
+                self.active[stage] = self.active.get(stage, 0) + 1
+            return Admission(admitted=True, stages=stages)
+
+    def release(self, stages: Tuple[str, ...]) -> None:
+        with self._lock:
+            for stage in stages:
+                self.active[stage] -= 1
+
+    @staticmethod
+    def _too_many(admission: Admission) -> HTTPException:
+        return HTTPException(
+            status_code=429,
+            detail=admission.reason,
+            headers={"Retry-After": str(admission.retry_after)}
+        )
+
+    @contextmanager
+    def stage(self, client_id: str, stage: str) -> Iterator[None]:
+        """Hold one stage for the duration of the block, or raise HTTP 429"""
+        admission = self.try_acquire(client_id, (stage,))
+        if not admission.admitted:
+            raise self._too_many(admission)
+        try:
+            yield
+        finally:
+            self.release(admission.stages)
+
+    # Work shared by coalesced requests is split in two: each requester is charged
+    # for it (charge before joining, or debit afterwards), while the shared work
+    # itself only holds a concurrency slot. One client's empty bucket then never
+    # fails another client's request.
+
+    def charge(self, client_id: str, stage: str) -> None:
+        """Charge the client's bucket for a stage without holding a slot, or raise HTTP 429"""
+        if not self.enabled:
+            return
+        with self._lock:
+            wait = self._bucket(client_id).take(self.costs[stage])
+            if wait <= 0:
+                return
+            admission = self._reject('rate_limit', wait, "Too many requests, please slow down")
+        raise self._too_many(admission)
+
+    def debit(self, client_id: str, stage: str) -> None:
+        """Bill a stage after it ran; an overdrawn client waits longer for its next request"""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._bucket(client_id).debit(self.costs[stage])
+
+    def try_acquire_slot(self, stage: str) -> Admission:
+        if not self.enabled:
+            return Admission(admitted=True)
+        with self._lock:
+            if self.active.get(stage, 0) >= self.concurrency[stage]:
+                return self._reject(stage, self.stage_retry_after,
+                                    f"Server is busy ({stage}), please retry later")
+            self.active[stage] = self.active.get(stage, 0) + 1
+            return Admission(admitted=True, stages=(stage,))
+
+    @contextmanager
+    def slot(self, stage: str) -> Iterator[None]:
+        """Hold one concurrency slot of a stage without charging any client, or raise HTTP 429"""
+        admission = self.try_acquire_slot(stage)
+        if not admission.admitted:
+            raise self._too_many(admission)
+        try:
+            yield
+        finally:
+            self.release(admission.stages)
+
+    def stats(self) -> Dict[str, Dict]:
+        with self._lock:
+            return {
+                'active': dict(self.active),
+                'rejected': dict(self.rejected),
+                'clients': len(self._buckets)
+            }
+
+
+def per_worker(limit: int, workers: int) -> int:
+    """Share of a whole-server concurrency budget for one worker (at least 1)"""
+    return max(1, limit // max(1, workers))
+
+
+admission_controller = AdmissionController(
+    costs={
+        'text': settings.COST_TEXT,
+        'pdf': settings.COST_PDF,
+        'ocr': settings.COST_OCR,
+        'llm': settings.COST_LLM,
+        'index': settings.COST_INDEX
+    },
+    concurrency={
+        'text': per_worker(settings.MAX_CONCURRENT_TEXT, settings.WORKERS),
+        'pdf': per_worker(settings.MAX_CONCURRENT_PDF, settings.WORKERS),
+        'ocr': per_worker(settings.MAX_CONCURRENT_OCR, settings.WORKERS),
+        'llm': per_worker(settings.MAX_CONCURRENT_LLM, settings.WORKERS),
+        'index': per_worker(settings.MAX_CONCURRENT_INDEX, settings.WORKERS)
+    },
+    bucket_capacity=settings.CLIENT_BUCKET_CAPACITY,
+    bucket_rate=settings.CLIENT_BUCKET_REFILL_PER_SEC,
+    stage_retry_after=settings.STAGE_RETRY_AFTER,
+    enabled=settings.ADMISSION_ENABLED
+)
+
+
+def client_id(request: Request) -> str:
+    """Identify the client by peer address, or by X-Forwarded-For behind trusted proxies.
+
+    Each trusted proxy appends the address it received the request from, so the
+    client is the TRUSTED_PROXY_HOPS-th entry from the right. Entries further left
+    are supplied by the client and must not be trusted.
+    """
+    hops = settings.TRUSTED_PROXY_HOPS
+    forwarded_for = request.headers.get('x-forwarded-for')
+    if hops > 0 and forwarded_for:
+        entries = [entry.strip() for entry in forwarded_for.split(',') if entry.strip()]
+        if entries:
+            return entries[-hops] if len(entries) >= hops else entries[0]
+    return request.client.host if request.client else 'unknown'
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Set
+import numpy as np
+from config import settings
+
+class SharedCache:
+    """Key/value cache in a SQLite file so every worker process shares the same hits"""
+
+    EVICT_EVERY = 200  # Writes between eviction passes
+
+    def __init__(self, path: str, max_entries: int = 50000, enabled: bool = True):
+        self.path = path
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._local = threading.local()
+        self._writes = 0
+        self._durable: Set[str] = set()
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Stable hash key for the given parts"""
+        digest = hashlib.sha256()
+        for part in parts:
+            if isinstance(part, bytes):
+                digest.update(part)
+            else:
+                digest.update(str(part).encode('utf-8'))
+            digest.update(b'\x00')
+        return digest.hexdigest()
+
+    def keep(self, namespace: str) -> None:
+        """Exempt a namespace from eviction, for state that cannot be recomputed"""
+        self._durable.add(namespace)
+
+    def _connection(self) -> sqlite3.Connection:
+        # Connections are per thread and per process; never reuse one across a fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, '
+                'created REAL NOT NULL, PRIMARY KEY (namespace, key))'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_created ON cache (created)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        return self.get_many(namespace, [key]).get(key, default)
+
+    def get_many(self, namespace: str, keys: Iterable[str]) -> Dict[str, Any]:
+        """Return the cached values found for keys; misses are left out"""
+        keys = list(keys)
+        if not self.enabled or not keys:
+            return {}
+        found = {}
+        try:
+            conn = self._connection()
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ','.join('?' * len(batch))
+                rows = conn.execute(
+                    f'SELECT key, value FROM cache WHERE namespace = ? AND key IN ({placeholders})',
+                    [namespace, *batch]
+                )
+                for key, value in rows:
+                    found[key] = pickle.loads(value)
+        except Exception as e:
+            print(f"Cache read failed: {e}")
+        return found
+
+    def set(self, namespace: str, key: str, value: Any) -> None:
+        self.set_many(namespace, {key: value})
+
+    def set_many(self, namespace: str, items: Dict[str, Any]) -> None:
+        if not self.enabled or not items:
+            return
+        try:
+            conn = self._connection()
+            now = time.time()
+            conn.executemany(
+                'INSERT OR REPLACE INTO cache (namespace, key, value, created) VALUES (?, ?, ?, ?)',
+                [(namespace, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now)
+                 for key, value in items.items()]
+            )
+            self._writes += len(items)
+            if self._writes >= self.EVICT_EVERY:
+                self._writes = 0
+                self._evict(conn)
+        except Exception as e:
+            print(f"Cache write failed: {e}")
+
+    def update(self, namespace: str, key: str, func: Callable[[Any], Any]) -> Any:
+        """Atomically replace the value at key with func(current value or None).
+        
+        The read-modify-write holds SQLite's write lock, so concurrent updates
+        from other workers are never lost.
+        """
+        if not self.enabled:
+            return func(None)
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT value FROM cache WHERE namespace = ? AND key = ?', (namespace, key)
+            ).fetchone()
+            value = func(pickle.loads(row[0]) if row else None)
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (namespace, key, value, created) VALUES (?, ?, ?, ?)',
+                (namespace, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), time.time())
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return value
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop the oldest entries beyond max_entries, never touching durable namespaces"""
+        durable = sorted(self._durable)
+        evictable = f"namespace NOT IN ({','.join('?' * len(durable))})" if durable else '1'
+        (count,) = conn.execute(f'SELECT COUNT(*) FROM cache WHERE {evictable}', durable).fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            conn.execute(
+                f'DELETE FROM cache WHERE rowid IN '
+                f'(SELECT rowid FROM cache WHERE {evictable} ORDER BY created LIMIT ?)',
+                (*durable, excess)
+            )
+
+
+class CachedEmbeddingModel:
+    """Embedding model wrapper that only encodes texts missing from the shared cache"""
+
+    NAMESPACE = 'embeddings'
+
+    def __init__(self, model, model_name: str, cache: SharedCache):
+        self.model = model
+        self.model_name = model_name
+        self.cache = cache
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        keys = [SharedCache.make_key(self.model_name, text) for text in texts]
+        cached = self.cache.get_many(self.NAMESPACE, keys)
+
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        if missing:
+            # Encode each distinct missing text once, in a single batch
+            unique_keys = list(dict.fromkeys(keys[i] for i in missing))
+            first_index = {keys[i]: i for i in reversed(missing)}
+            encoded = self.model.encode([texts[first_index[key]] for key in unique_keys])
+            new_entries = {key: np.asarray(encoded[j]) for j, key in enumerate(unique_keys)}
+            self.cache.set_many(self.NAMESPACE, new_entries)
+            cached.update(new_entries)
+
+        if not keys:
+            return self.model.encode(texts)
+        return np.stack([cached[key] for key in keys])
+
+
+shared_cache = SharedCache(
+    settings.CACHE_PATH,
+    max_entries=settings.CACHE_MAX_ENTRIES,
+    enabled=settings.CACHE_ENABLED
+)
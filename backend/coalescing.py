@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+class SingleFlight:
+    """Run one computation per key at a time and share it with concurrent duplicates"""
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.failed = 0
+
+    async def run(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """Await func() for key, joining the in-flight call if there is one.
+
+        Every waiter gets the same result or exception. Waiters are shielded from
+        each other: cancelling one (e.g. a client disconnect) leaves the shared
+        work running for the rest.
+        """
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            self.started += 1
+            task.add_done_callback(lambda t: self._finish(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Retrieve the exception so it is not reported as unhandled when every waiter left
+        if not task.cancelled() and task.exception() is not None:
+            self.failed += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'started': self.started,
+            'coalesced': self.coalesced,
+            'failed': self.failed,
+            'in_flight': len(self._in_flight)
+        }
@@ -13,6 +13,11 @@ class Settings(BaseSettings):
     OPENAI_API_KEY: str = ""
     OPENAI_BASE_URL: str = ""  # Optional: for custom OpenAI-compatible APIs
     
+    # Explainer prompt budget (tokens, measured with tiktoken)
+    EXPLAINER_TOP_K: int = 6
+    EXPLAINER_CONTEXT_TOKENS: int = 250
+    EXPLAINER_JOB_TOKENS: int = 200
+    
     # Embeddings
     EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"  # Local model, no API needed
     
@@ -23,6 +28,45 @@ class Settings(BaseSettings):
     UPLOAD_DIR: str = os.environ.get("UPLOAD_DIR", "/tmp/uploads")
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
     
+    # Client-extracted text is trusted when enough pages have a text layer
+    CLIENT_TEXT_MIN_PAGE_CHARS: int = 50
+    CLIENT_TEXT_MIN_COVERAGE: float = 0.8
+    
+    # Production workers (python main.py forks WORKERS processes when > 1)
+    WORKERS: int = 1
+    THREADS_PER_WORKER: int = 1  # torch / BLAS threads inside each worker
+    WORKER_TIMEOUT: int = 120
+    
+    # Shared cache for embeddings, extraction results and LLM responses
+    CACHE_ENABLED: bool = True
+    CACHE_PATH: str = os.environ.get("CACHE_PATH", "/tmp/cache/shared_cache.sqlite3")
+    CACHE_MAX_ENTRIES: int = 50000
+    
+    # Admission control: per-client token buckets (per worker) and per-stage concurrency
+    # (whole server; each worker gets MAX_CONCURRENT_* // WORKERS, at least 1)
+    ADMISSION_ENABLED: bool = True
+    TRUSTED_PROXY_HOPS: int = 0  # Proxies in front of the app that append to X-Forwarded-For
+    CLIENT_BUCKET_CAPACITY: float = 30.0
+    CLIENT_BUCKET_REFILL_PER_SEC: float = 0.5
+    COST_TEXT: float = 1.0
+    COST_PDF: float = 2.0
+    COST_OCR: float = 8.0
+    COST_LLM: float = 4.0
+    COST_INDEX: float = 20.0  # PUT /match/jobs embeds every submitted job
+    MAX_CONCURRENT_TEXT: int = 16
+    MAX_CONCURRENT_PDF: int = 8
+    MAX_CONCURRENT_OCR: int = 1
+    MAX_CONCURRENT_LLM: int = 8
+    MAX_CONCURRENT_INDEX: int = 1
+    STAGE_RETRY_AFTER: int = 2  # Seconds suggested when a stage is at capacity
+    
+    # Incremental re-analysis: score change that triggers a new LLM explanation
+    SESSION_RESCORE_THRESHOLD: float = 2.0
+    
+    # Job matching - JSON list of {id, title, description, requirements}
+    JOBS_FILE: str = os.environ.get("JOBS_FILE", "")
+    MATCH_ADMIN_TOKEN: str = ""  # Required by PUT /match/jobs; empty disables it
+    
     class Config:
         env_file = ".env"
         extra = "ignore"
@@ -0,0 +1,25 @@
+# Production launch: python main.py with WORKERS > 1, or gunicorn -c gunicorn.conf.py main:app
+import os
+from config import settings
+
+# Cap math-library threads before the app (and the embedding model) is imported
+for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+    os.environ.setdefault(var, str(settings.THREADS_PER_WORKER))
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+bind = f"{settings.HOST}:{settings.PORT}"
+workers = settings.WORKERS
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = settings.WORKER_TIMEOUT
+
+# Import the app (and load the embedding model) once in the master, then fork.
+# Workers share the model weights copy-on-write instead of each loading a copy.
+preload_app = True
+
+
+def post_fork(server, worker):
+    try:
+        import torch
+        torch.set_num_threads(settings.THREADS_PER_WORKER)
+    except ImportError:
+        pass
@@ -0,0 +1,144 @@
+"""Offline bulk ingestion of resume PDFs into a chunk + embedding store.
+
+Usage:
+    python ingest.py /path/to/resumes /path/to/store
+    python ingest.py campaign.zip /path/to/store --workers 8
+
+Extraction and chunking run in a process pool; chunks are embedded in batches in
+the main process and written to a ChunkStore. Files whose content hash is already
+in the store are skipped, so an interrupted run can simply be started again.
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterator, Tuple
+import numpy as np
+
+from processing.pdf_extractor import PDFExtractor
+from processing.chunker import ResumeChunker
+from processing.chunk_store import ChunkStore
+from config import settings
+
+
+def iter_pdfs(source: str) -> Iterator[Tuple[str, bytes]]:
+    """Yield (name, bytes) for every PDF in a directory tree or zip archive"""
+    if zipfile.is_zipfile(source):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and info.filename.lower().endswith('.pdf'):
+                    yield info.filename, archive.read(info)
+        return
+
+    for root, _, files in os.walk(source):
+        for filename in sorted(files):
+            if filename.lower().endswith('.pdf'):
+                path = os.path.join(root, filename)
+                with open(path, 'rb') as f:
+                    yield os.path.relpath(path, source), f.read()
+
+
+def process_pdf(doc_hash: str, name: str, content: bytes) -> Dict:
+    """Extract, section and chunk one PDF (runs in a worker process)"""
+    temp_path = os.path.join(tempfile.gettempdir(), f"{uuid.uuid4()}.pdf")
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(content)
+        text = PDFExtractor.extract_text(temp_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    sections = PDFExtractor.detect_sections(text)
+    chunks = ResumeChunker.chunk_by_sections(sections)
+    if not chunks:
+        chunks = [{'text': text, 'section': 'other', 'chunk_type': 'full', 'position': 0}]
+    return {'doc_hash': doc_hash, 'source': name, 'chunks': chunks}
+
+
+def ingest(source: str, store_dir: str, workers: int, batch_chunks: int) -> None:
+    # Imported here so pool workers never load the model
+    from embeddings.model_manager import EmbeddingModel
+
+    store = ChunkStore(store_dir)
+    seen = store.ingested_hashes()
+    embedding_model = EmbeddingModel(settings.EMBEDDING_MODEL)
+
+    pending_docs = []
+    pending_chunks = 0
+    ingested = skipped = failed = 0
+    started = time.perf_counter()
+
+    def flush():
+        nonlocal pending_docs, pending_chunks, ingested
+        if not pending_docs:
+            return
+        texts = [chunk['text'] for doc in pending_docs for chunk in doc['chunks']]
+        embeddings = np.asarray(embedding_model.encode(texts))
+        store.append(pending_docs, embeddings)
+        ingested += len(pending_docs)
+        elapsed = time.perf_counter() - started
+        print(f"Ingested {ingested} docs ({ingested / elapsed:.1f} docs/s), "
+              f"skipped {skipped}, failed {failed}")
+        pending_docs = []
+        pending_chunks = 0
+
+    def collect(done):
+        nonlocal pending_chunks, failed
+        for future in done:
+            try:
+                document = future.result()
+            except Exception as e:
+                failed += 1
+                print(f"Failed: {in_flight[future]}: {e}")
+                continue
+            finally:
+                del in_flight[future]
+            pending_docs.append(document)
+            pending_chunks += len(document['chunks'])
+        if pending_chunks >= batch_chunks:
+            flush()
+
+    in_flight = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for name, content in iter_pdfs(source):
+            doc_hash = hashlib.sha256(content).hexdigest()
+            if doc_hash in seen:
+                skipped += 1
+                continue
+            seen.add(doc_hash)
+
+            in_flight[pool.submit(process_pdf, doc_hash, name, content)] = name
+            # Bound memory: keep a few tasks queued per worker
+            if len(in_flight) >= workers * 4:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+    flush()
+
+    elapsed = time.perf_counter() - started
+    print(f"Done in {elapsed:.1f}s: {ingested} ingested ({ingested / max(elapsed, 1e-9):.1f} docs/s), "
+          f"{skipped} already in store, {failed} failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk ingest resume PDFs into a chunk store")
+    parser.add_argument('source', help="Directory or zip file of PDFs")
+    parser.add_argument('store', help="Output directory for the chunk store")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--batch-chunks', type=int, default=512,
+                        help="Chunks to accumulate before each embedding batch and shard")
+    args = parser.parse_args()
+
+    ingest(args.source, args.store, args.workers, args.batch_chunks)
+
+
+if __name__ == '__main__':
+    main()
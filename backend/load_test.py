@@ -0,0 +1,106 @@
+"""Simple load test for the analysis API.
+
+Run it against the server once per WORKERS setting and compare throughput.
+Every resume chunk and the job text carry a per-request tag, so no embedding
+comes from the shared cache, and requests ask for explain=false so the LLM does
+not dominate the timings.
+
+Embedding and scoring scale with workers, but each analysis also makes two writes
+to the shared SQLite cache (the job's percentile sketch update and the session),
+and SQLite serializes writes across workers. Expect throughput to flatten once
+those writes, not the CPU, are the bottleneck.
+
+Admission control would rate-limit a single client after a few dozen requests.
+Either start the server with ADMISSION_ENABLED=false, or pass --clients N to
+spread requests over N synthetic X-Forwarded-For addresses (honoured only when
+the server runs with TRUSTED_PROXY_HOPS=1 and the test talks to it directly).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+import httpx
+
+# {tag} appears in every section so each chunk's text is unique per request
+SAMPLE_RESUME = """
+Summary
+Ref {tag}. Software engineer with 4 years of experience building data pipelines and web services.
+Experience
+Built Python and SQL ETL jobs on AWS. Deployed services with Docker and Kubernetes. Ref {tag}
+Skills
+Python, SQL, Docker, Kubernetes, AWS, Machine Learning, Ref {tag}
+Education
+B.Sc. Computer Science, Ref {tag}
+Projects
+Resume ranking service using sentence embeddings. Ref {tag}
+"""
+
+SAMPLE_JOB = """
+We are hiring a backend engineer with strong Python and SQL skills, experience with
+cloud platforms (AWS or GCP) and container orchestration. ML experience is a plus. Ref {tag}
+"""
+
+
+async def run(url: str, endpoint: str, concurrency: int, total: int, timeout: float, clients: int):
+    latencies = []
+    failures = 0
+    throttled = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(base_url=url, timeout=timeout) as client:
+        async def one_request(number: int):
+            nonlocal failures, throttled
+            async with semaphore:
+                tag = uuid.uuid4().hex
+                data = {
+                    'resume_text': SAMPLE_RESUME.format(tag=tag),
+                    'job_description': SAMPLE_JOB.format(tag=tag),
+                }
+                headers = {}
+                if clients > 0:
+                    client_number = number % clients
+                    headers['X-Forwarded-For'] = f"10.0.{client_number // 256 % 256}.{client_number % 256}"
+                start = time.perf_counter()
+                try:
+                    response = await client.post(endpoint, params={'explain': 'false'},
+                                                 data=data, headers=headers)
+                    if response.status_code == 429:
+                        throttled += 1
+                    if response.status_code != 200:
+                        failures += 1
+                        return
+                except httpx.HTTPError:
+                    failures += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one_request(number) for number in range(total)))
+        elapsed = time.perf_counter() - started
+
+    print(f"Requests:    {total} ({failures} failed, {throttled} of them throttled)")
+    print(f"Elapsed:     {elapsed:.2f}s")
+    print(f"Throughput:  {len(latencies) / elapsed:.2f} req/s")
+    if latencies:
+        latencies.sort()
+        print(f"Latency p50: {statistics.median(latencies) * 1000:.0f} ms")
+        print(f"Latency p95: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the resume analysis API")
+    parser.add_argument('--url', default='http://localhost:7860')
+    parser.add_argument('--endpoint', default='/analyze/text')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--timeout', type=float, default=120.0)
+    parser.add_argument('--clients', type=int, default=0,
+                        help="Spread requests over this many synthetic client addresses")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.url, args.endpoint, args.concurrency, args.requests, args.timeout, args.clients))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,18 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from routes import analyze
 from config import settings
 import os
 
+if __name__ == "__main__" and settings.WORKERS > 1 and not settings.DEBUG:
+    # Preforking server that loads the model once and shares it across workers.
+    # Hand over before importing the routes, which load the model (and JOBS_FILE)
+    # that gunicorn's master would then load again.
+    os.execvp("gunicorn", ["gunicorn", "-c", "gunicorn.conf.py", "main:app"])
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from routes import analyze, match
+from admission import admission_controller, client_id
+
 # Create upload directories
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 os.makedirs(settings.CHROMA_PERSIST_DIRECTORY, exist_ok=True)
@@ -15,6 +24,28 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Admission control - reject expensive requests early when the client or a stage is over budget.
+# Registered before CORS so CORS stays outermost and 429s carry CORS headers.
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    stages = admission_controller.classify(
+        request.method, request.url.path, request.query_params.get("explain")
+    )
+    if stages is None:
+        return await call_next(request)
+    
+    admission = admission_controller.try_acquire(client_id(request), stages)
+    if not admission.admitted:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": admission.reason},
+            headers={"Retry-After": str(admission.retry_after)}
+        )
+    try:
+        return await call_next(request)
+    finally:
+        admission_controller.release(admission.stages)
+
 # CORS middleware - allow all for deployment
 app.add_middleware(
     CORSMiddleware,
@@ -26,6 +57,7 @@ app.add_middleware(
 
 # Include routers
 app.include_router(analyze.router)
+app.include_router(match.router)
 
 @app.get("/")
 def root():
@@ -39,6 +71,15 @@ def root():
 def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+def metrics():
+    # Per worker process
+    return {
+        "pid": os.getpid(),
+        "analysis_coalescing": analyze.analysis_flights.stats(),
+        "admission": admission_controller.stats()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host=settings.HOST, port=settings.PORT, reload=settings.DEBUG)
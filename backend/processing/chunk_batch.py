@@ -0,0 +1,79 @@
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Union
+import numpy as np
+
+class ChunkBatch:
+    """Array-backed batch of chunks with section masks computed once.
+
+    Indexing and iteration still yield chunk dicts, so code written against
+    lists of dicts keeps working.
+    """
+
+    __slots__ = ('texts', 'chunk_types', 'section_names', 'section_codes',
+                 'positions', 'embeddings', 'masks')
+
+    # Section predicates used by the ranking engine, evaluated once per distinct section name
+    MASK_RULES: Dict[str, Callable[[str], bool]] = {
+        'skills': lambda s: s == 'skills',
+        'experience': lambda s: s == 'experience',
+        'education': lambda s: s == 'education',
+        'projects': lambda s: s == 'projects',
+        'job_skills': lambda s: 'skill' in s.lower() or 'requirement' in s.lower(),
+        'job_experience': lambda s: 'experience' in s.lower() or 'responsibility' in s.lower(),
+    }
+
+    def __init__(self, texts: List[str], sections: Sequence[str], positions: Sequence[int],
+                 chunk_types: Optional[List[str]] = None, embeddings: Optional[np.ndarray] = None):
+        self.texts = texts
+        self.chunk_types = chunk_types if chunk_types is not None else [''] * len(texts)
+        self.positions = np.asarray(positions, dtype=np.int32)
+        self.embeddings = embeddings
+
+        # Sections are stored as small integer codes into section_names
+        names: Dict[str, int] = {}
+        self.section_codes = np.fromiter(
+            (names.setdefault(section, len(names)) for section in sections),
+            dtype=np.int16, count=len(texts)
+        )
+        self.section_names = tuple(names)
+
+        self.masks = {}
+        for mask_name, rule in self.MASK_RULES.items():
+            lookup = np.fromiter((rule(name) for name in self.section_names),
+                                 dtype=bool, count=len(self.section_names))
+            self.masks[mask_name] = lookup[self.section_codes] if len(lookup) else np.zeros(0, dtype=bool)
+
+    @classmethod
+    def from_dicts(cls, chunks: List[Dict], embeddings: Optional[np.ndarray] = None) -> 'ChunkBatch':
+        return cls(
+            texts=[c['text'] for c in chunks],
+            sections=[c.get('section', '') for c in chunks],
+            positions=[c.get('position', 0) for c in chunks],
+            chunk_types=[c.get('chunk_type', '') for c in chunks],
+            embeddings=embeddings
+        )
+
+    @classmethod
+    def coerce(cls, chunks: Union['ChunkBatch', List[Dict]]) -> 'ChunkBatch':
+        """Return chunks as a ChunkBatch, converting a list of dicts if needed"""
+        return chunks if isinstance(chunks, cls) else cls.from_dicts(chunks)
+
+    def section(self, i: int) -> str:
+        return self.section_names[self.section_codes[i]]
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __getitem__(self, i: int) -> Dict:
+        return {
+            'text': self.texts[i],
+            'section': self.section(i),
+            'chunk_type': self.chunk_types[i],
+            'position': int(self.positions[i])
+        }
+
+    def __iter__(self) -> Iterator[Dict]:
+        for i in range(len(self.texts)):
+            yield self[i]
+
+    def to_dicts(self) -> List[Dict]:
+        return list(self)
@@ -0,0 +1,133 @@
+import json
+import os
+import re
+from typing import Dict, Iterator, List, Set, Tuple
+import numpy as np
+
+class ChunkStore:
+    """Append-only columnar store of resume chunks and their embeddings.
+
+    Each ingested batch becomes a shard: an embedding matrix in shard-NNNNN.npy and
+    one JSON line per chunk in shard-NNNNN.jsonl. Documents are only considered
+    ingested once their line is appended to manifest.jsonl, so a crash mid-batch
+    leaves an orphan shard that readers ignore and the next run re-ingests.
+    """
+
+    MANIFEST = 'manifest.jsonl'
+    SHARD_PATTERN = re.compile(r'^shard-(\d+)\.npy$')
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _manifest(self) -> List[Dict]:
+        path = os.path.join(self.directory, self.MANIFEST)
+        if not os.path.exists(path):
+            return []
+        entries = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Torn final line from a crash; that document is not committed
+                    continue
+        return entries
+
+    def _drop_torn_tail(self, f) -> None:
+        """Truncate a manifest opened for update back to its last complete line"""
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size == 0:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return
+        # Scan back for the end of the last complete line
+        end = size
+        while end > 0:
+            start = max(0, end - 4096)
+            f.seek(start)
+            block = f.read(end - start)
+            newline = block.rfind(b'\n')
+            if newline >= 0:
+                f.truncate(start + newline + 1)
+                return
+            end = start
+        f.truncate(0)
+
+    def ingested_hashes(self) -> Set[str]:
+        return {entry['doc_hash'] for entry in self._manifest()}
+
+    def _next_shard_name(self) -> str:
+        indices = [int(m.group(1)) for m in map(self.SHARD_PATTERN.match, os.listdir(self.directory)) if m]
+        return f"shard-{max(indices, default=0) + 1:05d}"
+
+    def append(self, documents: List[Dict], embeddings: np.ndarray) -> str:
+        """Write one shard for documents ({doc_hash, source, chunks}) and commit it.
+
+        Rows of embeddings follow the documents' chunks in order.
+        """
+        shard = self._next_shard_name()
+        base = os.path.join(self.directory, shard)
+
+        # Shard files are written under temporary names and renamed into place
+        with open(base + '.npy.tmp', 'wb') as f:
+            np.save(f, np.asarray(embeddings, dtype=np.float32), allow_pickle=False)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(base + '.jsonl.tmp', 'w', encoding='utf-8') as f:
+            row = 0
+            for document in documents:
+                for chunk in document['chunks']:
+                    f.write(json.dumps({
+                        'doc_hash': document['doc_hash'],
+                        'source': document['source'],
+                        'row': row,
+                        'text': chunk['text'],
+                        'section': chunk['section'],
+                        'chunk_type': chunk.get('chunk_type', ''),
+                        'position': chunk['position']
+                    }) + '\n')
+                    row += 1
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(base + '.npy.tmp', base + '.npy')
+        os.replace(base + '.jsonl.tmp', base + '.jsonl')
+
+        # Commit point
+        lines = ''.join(
+            json.dumps({
+                'doc_hash': document['doc_hash'],
+                'source': document['source'],
+                'shard': shard,
+                'n_chunks': len(document['chunks'])
+            }) + '\n'
+            for document in documents
+        )
+        path = os.path.join(self.directory, self.MANIFEST)
+        with open(path, 'r+b' if os.path.exists(path) else 'w+b') as f:
+            # A crash mid-write leaves a torn last line; appending to it would
+            # also corrupt (and so uncommit) the first line written here
+            self._drop_torn_tail(f)
+            f.seek(0, os.SEEK_END)
+            f.write(lines.encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+        return shard
+
+    def iter_shards(self) -> Iterator[Tuple[List[Dict], np.ndarray]]:
+        """Yield (chunk records, memory-mapped embeddings) for each committed shard.
+
+        Each record's 'row' indexes into the shard's embedding matrix.
+        """
+        committed = {}
+        for entry in self._manifest():
+            committed.setdefault(entry['shard'], set()).add(entry['doc_hash'])
+
+        for shard in sorted(committed):
+            base = os.path.join(self.directory, shard)
+            embeddings = np.load(base + '.npy', mmap_mode='r')
+            with open(base + '.jsonl', 'r', encoding='utf-8') as f:
+                records = [json.loads(line) for line in f]
+            yield [r for r in records if r['doc_hash'] in committed[shard]], embeddings
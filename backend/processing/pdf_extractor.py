@@ -4,14 +4,19 @@ import pytesseract
 from pdf2image import convert_from_path
 from PIL import Image
 import re
-from typing import Dict, List
+from contextlib import nullcontext
+from typing import Callable, ContextManager, Dict, List, Optional
 
 class PDFExtractor:
     """Extract text from PDF resumes with fallback mechanisms"""
     
     @staticmethod
-    def extract_text(pdf_path: str) -> str:
-        """Extract text from PDF using pdfplumber, fallback to PyPDF2, then OCR"""
+    def extract_text(pdf_path: str, ocr_guard: Optional[Callable[[], ContextManager]] = None) -> str:
+        """Extract text from PDF using pdfplumber, fallback to PyPDF2, then OCR.
+        
+        ocr_guard, if given, is entered around the OCR fallback (e.g. to limit
+        concurrent OCR); exceptions it raises propagate unchanged.
+        """
         try:
             # Primary: pdfplumber
             with pdfplumber.open(pdf_path) as pdf:
@@ -37,22 +42,32 @@ class PDFExtractor:
         except Exception as e:
             print(f"PyPDF2 failed: {e}, trying OCR...")
         
-        try:
-            # Fallback 2: OCR with Tesseract
-            print("Attempting OCR extraction (this may take a moment)...")
-            images = convert_from_path(pdf_path, dpi=300)
-            text = ""
-            for i, image in enumerate(images):
-                page_text = pytesseract.image_to_string(image, lang='eng')
-                text += page_text + "\n"
-                print(f"OCR page {i+1}: extracted {len(page_text)} chars")
-            
-            if text.strip():
-                return PDFExtractor.normalize_text(text)
-            else:
-                raise Exception("OCR extraction returned empty text")
-        except Exception as e:
-            raise Exception(f"All extraction methods failed. Last error (OCR): {e}")
+        with ocr_guard() if ocr_guard is not None else nullcontext():
+            try:
+                # Fallback 2: OCR with Tesseract
+                print("Attempting OCR extraction (this may take a moment)...")
+                images = convert_from_path(pdf_path, dpi=300)
+                text = ""
+                for i, image in enumerate(images):
+                    page_text = pytesseract.image_to_string(image, lang='eng')
+                    text += page_text + "\n"
+                    print(f"OCR page {i+1}: extracted {len(page_text)} chars")
+                
+                if text.strip():
+                    return PDFExtractor.normalize_text(text)
+                else:
+                    raise Exception("OCR extraction returned empty text")
+            except Exception as e:
+                raise Exception(f"All extraction methods failed. Last error (OCR): {e}")
+    
+    @staticmethod
+    def has_text_layer(page_char_counts: List[int], min_chars_per_page: int = 50,
+                       min_coverage: float = 0.8) -> bool:
+        """Check per-page character counts for a usable text layer (not scanned or empty)"""
+        if not page_char_counts:
+            return False
+        pages_with_text = sum(1 for count in page_char_counts if count >= min_chars_per_page)
+        return pages_with_text / len(page_char_counts) >= min_coverage
     
     @staticmethod
     def normalize_text(text: str) -> str:
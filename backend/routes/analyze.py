@@ -1,24 +1,38 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Query, Request
+from starlette.concurrency import run_in_threadpool
 from typing import Optional
 import os
+import json
 import uuid
+import hashlib
 import tempfile
+from contextlib import contextmanager
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Literal, Tuple
+import numpy as np
 
 from embeddings.model_manager import EmbeddingModel
 from scoring.ranking_engine import RankingEngine
+from scoring.percentiles import score_percentiles
 from rag.explainer import RAGExplainer
 from processing.pdf_extractor import PDFExtractor
 from processing.chunker import ResumeChunker
+from processing.chunk_batch import ChunkBatch
+from cache import SharedCache, shared_cache, CachedEmbeddingModel
+from sessions import session_store
+from coalescing import SingleFlight
+from admission import admission_controller, client_id
 from config import settings
 
 router = APIRouter(prefix="/analyze", tags=["Resume Analysis"])
 
-# Initialize services
-embedding_model = EmbeddingModel(settings.EMBEDDING_MODEL)
+# Initialize services (loaded at import so a preloading server shares the weights)
+embedding_model = CachedEmbeddingModel(
+    EmbeddingModel(settings.EMBEDDING_MODEL), settings.EMBEDDING_MODEL, shared_cache
+)
 ranking_engine = RankingEngine()
 rag_explainer = None  # Lazy init to avoid startup crash if no API key
+analysis_flights = SingleFlight()  # Coalesces identical concurrent analyses
 
 
 def get_rag_explainer():
@@ -28,6 +42,35 @@ def get_rag_explainer():
     return rag_explainer
 
 
+def analysis_key(*parts) -> str:
+    """Key identifying an analysis by its inputs and the settings that shape its result"""
+    return SharedCache.make_key(
+        settings.EMBEDDING_MODEL, RAGExplainer.MODEL_NAME, settings.EXPLAINER_TOP_K,
+        settings.EXPLAINER_CONTEXT_TOKENS, settings.EXPLAINER_JOB_TOKENS, *parts
+    )
+
+
+def extract_pdf_text(content: bytes, ocr_guard=None) -> str:
+    """Extract text from PDF bytes, reusing earlier results for identical files"""
+    # Plain SHA-256, the same hash clients send as resume_sha256
+    cache_key = hashlib.sha256(content).hexdigest()
+    cached_text = shared_cache.get('extraction', cache_key)
+    if cached_text is not None:
+        return cached_text
+    
+    temp_path = os.path.join(tempfile.gettempdir(), f"{uuid.uuid4()}.pdf")
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(content)
+        text = PDFExtractor.extract_text(temp_path, ocr_guard=ocr_guard)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    
+    shared_cache.set('extraction', cache_key, text)
+    return text
+
+
 class AnalysisResponse(BaseModel):
     score: float
     breakdown: Dict[str, float]
@@ -36,19 +79,241 @@ class AnalysisResponse(BaseModel):
     missing_skills: List[str]
     strengths: List[str]
     improvement_suggestions: List[str]
+    token_usage: Optional[Dict[str, int]] = None
+    session_id: Optional[str] = None
+    changed_chunks: Optional[int] = None
+    percentile: Optional[float] = None  # Share of applicants to this job scoring at or below
+    applicants: Optional[int] = None
+    explanation_status: str = "complete"  # complete | pending | skipped
+    explanation_url: Optional[str] = None
+
+
+ExplainMode = Literal['false', 'lazy', 'eager']
+
+
+def build_response(ranking_result: Dict, explanation: Optional[Dict], **fields) -> AnalysisResponse:
+    """AnalysisResponse from a ranking and an explanation (None for score-only)"""
+    explanation = explanation or {}
+    return AnalysisResponse(
+        score=ranking_result['score'],
+        breakdown=ranking_result['breakdown'],
+        overall_assessment=explanation.get('overall_assessment', ''),
+        matched_skills=explanation.get('matched_skills', []),
+        missing_skills=explanation.get('missing_skills', []),
+        strengths=explanation.get('strengths', []),
+        improvement_suggestions=explanation.get('improvement_suggestions', []),
+        token_usage=explanation.get('token_usage'),
+        **fields
+    )
+
+
+def ocr_guard_for(request: Request):
+    """OCR fallback guard charging the requesting client and holding an OCR slot"""
+    client = client_id(request)
+    return lambda: admission_controller.stage(client, 'ocr')
+
+
+def client_text_layer(page_char_counts: str, field: str) -> bool:
+    """Whether per-page character counts sent by a client show a usable text layer"""
+    try:
+        counts = [int(count) for count in json.loads(page_char_counts)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail=f"{field} must be a JSON list of integers")
+    return PDFExtractor.has_text_layer(counts, settings.CLIENT_TEXT_MIN_PAGE_CHARS,
+                                       settings.CLIENT_TEXT_MIN_COVERAGE)
+
+
+class SharedOcrGuard:
+    """OCR fallback guard for work shared by coalesced requests.
+
+    Holds an OCR slot without charging any one client, and records whether OCR
+    ran so that every requester can be billed for it afterwards.
+    """
+
+    def __init__(self):
+        self.used = False
+
+    @contextmanager
+    def __call__(self):
+        with admission_controller.slot('ocr'):
+            self.used = True
+            yield
+
+
+def run_analysis(resume_text: str, job_text: str, session_id: Optional[str] = None,
+                 explain: ExplainMode = 'eager') -> AnalysisResponse:
+    """
+    Chunk, embed, score and explain a resume against a job.
+    
+    With the id of an earlier session for the same job, only chunks whose
+    content changed are re-embedded, and the explanation is reused unless
+    the score moved by at least SESSION_RESCORE_THRESHOLD points.
+    With explain='lazy' or 'false' no LLM call is made; the explanation can be
+    fetched later from /analyze/{session_id}/explanation.
+    """
+    session = session_store.get(session_id) if session_id else None
+    job_key = SharedCache.make_key(job_text)
+    if session is not None and session['job_key'] != job_key:
+        session = None  # Different job, nothing to reuse
+    
+    # Detect sections from resume text
+    resume_sections = PDFExtractor.detect_sections(resume_text)
+    resume_chunks = ResumeChunker.chunk_by_sections(resume_sections)
+    
+    # If no chunks, create a single chunk from full text
+    if not resume_chunks:
+        resume_chunks = [{
+            'text': resume_text,
+            'section': 'other',
+            'chunk_type': 'full',
+            'position': 0
+        }]
+    
+    # Create job chunks
+    job_chunks = [
+        {'text': job_text, 'section': 'description', 'position': 0},
+        {'text': job_text, 'section': 'requirements', 'position': 1}
+    ]
+    
+    # Generate embeddings, reusing the session's for unchanged chunks
+    chunk_keys = [session_store.chunk_key(chunk) for chunk in resume_chunks]
+    if session is not None:
+        known_embeddings = dict(zip(session['chunk_keys'], session['resume_embeddings']))
+        job_embeddings = session['job_embeddings']
+    else:
+        known_embeddings = {}
+        job_embeddings = embedding_model.encode([chunk['text'] for chunk in job_chunks])
+    
+    changed = [i for i, key in enumerate(chunk_keys) if key not in known_embeddings]
+    if changed:
+        new_embeddings = embedding_model.encode([resume_chunks[i]['text'] for i in changed])
+        for i, embedding in zip(changed, new_embeddings):
+            known_embeddings[chunk_keys[i]] = embedding
+    resume_embeddings = np.stack([known_embeddings[key] for key in chunk_keys])
+    
+    # Section masks are computed once here and shared by ranking and the explainer
+    resume_batch = ChunkBatch.from_dicts(resume_chunks, resume_embeddings)
+    job_batch = ChunkBatch.from_dicts(job_chunks, job_embeddings)
+    
+    # Calculate ranking
+    ranking_result = ranking_engine.rank_resume(
+        resume_batch, job_batch,
+        resume_embeddings, job_embeddings
+    )
+    
+    # Generate AI explanation and suggestions, unless the score barely moved since
+    # the explanation was written (compared to that score, so small edits cannot
+    # drift away from it one step at a time)
+    explanation, explained_score = None, None
+    if (session is not None and session.get('explained_score') is not None
+            and abs(ranking_result['score'] - session['explained_score']) < settings.SESSION_RESCORE_THRESHOLD):
+        explanation = dict(session['explanation'], token_usage=None)
+        explained_score = session['explained_score']
+    elif explain == 'eager':
+        explanation = get_rag_explainer().generate_explanation(
+            resume_text=resume_text,
+            job_description=job_text,
+            ranking_result=ranking_result,
+            resume_chunks=resume_batch,
+            job_chunks=job_batch,
+            resume_embeddings=resume_embeddings,
+            job_embeddings=job_embeddings
+        )
+        explained_score = ranking_result['score']
+    
+    # Place the score among earlier applicants to the same job; a re-submission
+    # within a session is looked up only, so one candidate is counted once
+    if session is None:
+        percentile, applicants = score_percentiles.record(job_key, ranking_result['score'])
+    else:
+        percentile, applicants = score_percentiles.lookup(job_key, ranking_result['score'])
+    
+    if session is None:
+        session_id = session_store.new_id()
+    # The session also keeps the ranking context needed to explain it later
+    session_store.save(session_id, {
+        'job_key': job_key,
+        'job_text': job_text,
+        'job_embeddings': job_embeddings,
+        'resume_text': resume_text,
+        'resume_chunks': resume_chunks,
+        'chunk_keys': chunk_keys,
+        'resume_embeddings': resume_embeddings,
+        'ranking_result': ranking_result,
+        'score': ranking_result['score'],
+        'explanation': explanation,
+        'explained_score': explained_score
+    })
+    
+    if explanation is not None:
+        status, url = 'complete', None
+    elif explain == 'lazy':
+        status, url = 'pending', f"{router.prefix}/{session_id}/explanation"
+    else:
+        status, url = 'skipped', None
+    
+    return build_response(
+        ranking_result, explanation,
+        session_id=session_id,
+        changed_chunks=len(changed),
+        percentile=round(percentile, 1) if percentile is not None else None,
+        applicants=applicants,
+        explanation_status=status,
+        explanation_url=url
+    )
+
+
+def explain_session(session_id: str) -> AnalysisResponse:
+    """Generate (once) and return the explanation for a stored analysis.
+
+    Generation holds an LLM slot; requesters are charged by the caller.
+    """
+    session = session_store.get(session_id)
+    if session is None or 'ranking_result' not in session:
+        raise HTTPException(status_code=404, detail="Analysis not found or expired")
+    
+    ranking_result = session['ranking_result']
+    explanation = session.get('explanation')
+    if explanation is None:
+        resume_batch = ChunkBatch.from_dicts(session['resume_chunks'], session['resume_embeddings'])
+        job_batch = ChunkBatch.from_dicts([
+            {'text': session['job_text'], 'section': 'description', 'position': 0},
+            {'text': session['job_text'], 'section': 'requirements', 'position': 1}
+        ], session['job_embeddings'])
+        with admission_controller.slot('llm'):
+            explanation = get_rag_explainer().generate_explanation(
+                resume_text=session['resume_text'],
+                job_description=session['job_text'],
+                ranking_result=ranking_result,
+                resume_chunks=resume_batch,
+                job_chunks=job_batch
+            )
+        session_store.attach_explanation(session_id, ranking_result['score'], explanation)
+    
+    percentile, applicants = score_percentiles.lookup(session['job_key'], ranking_result['score'])
+    return build_response(
+        ranking_result, explanation,
+        session_id=session_id,
+        percentile=round(percentile, 1) if percentile is not None else None,
+        applicants=applicants
+    )
 
 
 @router.post("/resume", response_model=AnalysisResponse)
 async def analyze_resume(
+    request: Request,
     resume: UploadFile = File(..., description="Resume PDF file"),
     job_description_text: Optional[str] = Form(None, description="Job description as text"),
-    job_description_file: Optional[UploadFile] = File(None, description="Job description as PDF")
+    job_description_file: Optional[UploadFile] = File(None, description="Job description as PDF"),
+    session_id: Optional[str] = Form(None, description="Session id from an earlier analysis of this resume"),
+    explain: ExplainMode = Query('eager', description="eager: explain inline; lazy: explain on request; false: score only")
 ):
     """
     Analyze a resume against a job description.
     
     Provide either job_description_text OR job_description_file (PDF).
     Returns score, breakdown, and AI-powered improvement suggestions.
+    Pass the returned session_id with a revised resume to re-analyze incrementally.
     """
     
     # Validate inputs
@@ -62,152 +327,142 @@ async def analyze_resume(
         raise HTTPException(status_code=400, detail="Resume must be a PDF file")
     
     try:
-        # Save resume temporarily
-        resume_temp_path = os.path.join(tempfile.gettempdir(), f"{uuid.uuid4()}.pdf")
-        with open(resume_temp_path, "wb") as f:
-            content = await resume.read()
-            f.write(content)
-        
-        # Extract resume text
-        resume_text = PDFExtractor.extract_text(resume_temp_path)
-        resume_sections = PDFExtractor.detect_sections(resume_text)
-        resume_chunks = ResumeChunker.chunk_by_sections(resume_sections)
-        
-        # If no chunks, create a single chunk from full text
-        if not resume_chunks:
-            resume_chunks = [{
-                'text': resume_text,
-                'section': 'other',
-                'chunk_type': 'full',
-                'position': 0
-            }]
-        
-        # Get job description
+        resume_content = await resume.read()
+        job_content = None
         if job_description_file and job_description_file.filename:
-            # Extract from PDF
-            job_temp_path = os.path.join(tempfile.gettempdir(), f"{uuid.uuid4()}.pdf")
-            with open(job_temp_path, "wb") as f:
-                job_content = await job_description_file.read()
-                f.write(job_content)
-            job_text = PDFExtractor.extract_text(job_temp_path)
-            os.remove(job_temp_path)
-        else:
-            job_text = job_description_text
-        
-        # Create job chunks
-        job_chunks = [
-            {'text': job_text, 'section': 'description', 'position': 0},
-            {'text': job_text, 'section': 'requirements', 'position': 1}
-        ]
-        
-        # Generate embeddings
-        resume_texts = [chunk['text'] for chunk in resume_chunks]
-        job_texts = [chunk['text'] for chunk in job_chunks]
-        
-        resume_embeddings = embedding_model.encode(resume_texts)
-        job_embeddings = embedding_model.encode(job_texts)
-        
-        # Calculate ranking
-        ranking_result = ranking_engine.rank_resume(
-            resume_chunks, job_chunks,
-            resume_embeddings, job_embeddings
-        )
+            job_content = await job_description_file.read()
         
-        # Generate AI explanation and suggestions
-        explanation = get_rag_explainer().generate_explanation(
-            resume_text=resume_text,
-            job_description=job_text,
-            ranking_result=ranking_result,
-            resume_chunks=resume_chunks,
-            job_chunks=job_chunks
-        )
-        
-        # Clean up temp file
-        os.remove(resume_temp_path)
+        def analyze() -> Tuple[AnalysisResponse, bool]:
+            ocr_guard = SharedOcrGuard()
+            
+            # Extract resume text
+            resume_text = extract_pdf_text(resume_content, ocr_guard)
+            
+            # Get job description
+            if job_content is not None:
+                # Extract from PDF
+                job_text = extract_pdf_text(job_content, ocr_guard)
+            else:
+                job_text = job_description_text
+            
+            return run_analysis(resume_text, job_text, session_id, explain), ocr_guard.used
         
-        return AnalysisResponse(
-            score=ranking_result['score'],
-            breakdown=ranking_result['breakdown'],
-            overall_assessment=explanation.get('overall_assessment', ''),
-            matched_skills=explanation.get('matched_skills', []),
-            missing_skills=explanation.get('missing_skills', []),
-            strengths=explanation.get('strengths', []),
-            improvement_suggestions=explanation.get('improvement_suggestions', [])
-        )
+        # Duplicate submissions in flight share one extraction, embedding and LLM call
+        key = analysis_key('pdf', resume_content,
+                           'job_pdf' if job_content is not None else 'job_text',
+                           job_content if job_content is not None else job_description_text,
+                           session_id, explain)
+        response, ocr_used = await analysis_flights.run(key, lambda: run_in_threadpool(analyze))
+        if ocr_used:
+            admission_controller.debit(client_id(request), 'ocr')
+        return response
         
+    except HTTPException:
+        raise
     except Exception as e:
-        # Clean up temp files on error
-        if 'resume_temp_path' in locals() and os.path.exists(resume_temp_path):
-            os.remove(resume_temp_path)
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
 
 @router.post("/text", response_model=AnalysisResponse)
 async def analyze_resume_text(
-    resume_text: str = Form(..., description="Resume text content"),
-    job_description: str = Form(..., description="Job description text")
+    request: Request,
+    resume_text: str = Form("", description="Resume text content"),
+    job_description: str = Form(..., description="Job description text"),
+    session_id: Optional[str] = Form(None, description="Session id from an earlier analysis of this resume"),
+    resume_sha256: Optional[str] = Form(None, description="SHA-256 of the PDF the resume text was extracted from"),
+    page_char_counts: Optional[str] = Form(None, description="JSON list of characters extracted per PDF page"),
+    job_page_char_counts: Optional[str] = Form(None, description="Same, when job_description was extracted from a PDF"),
+    resume_file: Optional[UploadFile] = File(None, description="Resume PDF, used only when the text layer is missing"),
+    explain: ExplainMode = Query('eager', description="eager: explain inline; lazy: explain on request; false: score only")
 ):
     """
     Analyze resume text against job description text.
     Use this endpoint if you already have extracted text.
-    """
     
-    if not resume_text.strip():
-        raise HTTPException(status_code=400, detail="Resume text cannot be empty")
+    Clients that extracted the text from a PDF themselves send page_char_counts
+    (job_page_char_counts for a job description PDF, which must have a text layer).
+    The text is trusted, and normalized the same way as server-side extraction,
+    unless those counts show a scanned or empty document; then the server
+    extracts (and OCRs) the PDF given as resume_file, checked against
+    resume_sha256 when sent.
+    """
     
     if not job_description.strip():
         raise HTTPException(status_code=400, detail="Job description cannot be empty")
     
+    if job_page_char_counts is not None:
+        if not client_text_layer(job_page_char_counts, 'job_page_char_counts'):
+            raise HTTPException(
+                status_code=422,
+                detail="Job description PDF has little or no extractable text; upload it to /analyze/resume"
+            )
+        # Same text as server-side extraction of that PDF, so job keys and scores match
+        job_description = PDFExtractor.normalize_text(job_description)
+    
+    resume_content = None
+    if page_char_counts is not None:
+        if client_text_layer(page_char_counts, 'page_char_counts'):
+            resume_text = PDFExtractor.normalize_text(resume_text)
+        elif resume_file is not None and resume_file.filename:
+            resume_content = await resume_file.read()
+            if resume_sha256 and hashlib.sha256(resume_content).hexdigest() != resume_sha256.lower():
+                raise HTTPException(status_code=400, detail="resume_sha256 does not match resume_file")
+        else:
+            raise HTTPException(
+                status_code=422,
+                detail="Resume has little or no extractable text; upload the PDF as resume_file"
+            )
+    
+    if resume_content is None and not resume_text.strip():
+        raise HTTPException(status_code=400, detail="Resume text cannot be empty")
+    
     try:
-        # Detect sections from resume text
-        resume_sections = PDFExtractor.detect_sections(resume_text)
-        resume_chunks = ResumeChunker.chunk_by_sections(resume_sections)
-        
-        if not resume_chunks:
-            resume_chunks = [{
-                'text': resume_text,
-                'section': 'other',
-                'chunk_type': 'full',
-                'position': 0
-            }]
-        
-        # Create job chunks
-        job_chunks = [
-            {'text': job_description, 'section': 'description', 'position': 0},
-            {'text': job_description, 'section': 'requirements', 'position': 1}
-        ]
-        
-        # Generate embeddings
-        resume_texts = [chunk['text'] for chunk in resume_chunks]
-        job_texts = [chunk['text'] for chunk in job_chunks]
-        
-        resume_embeddings = embedding_model.encode(resume_texts)
-        job_embeddings = embedding_model.encode(job_texts)
-        
-        # Calculate ranking
-        ranking_result = ranking_engine.rank_resume(
-            resume_chunks, job_chunks,
-            resume_embeddings, job_embeddings
-        )
-        
-        # Generate AI explanation
-        explanation = get_rag_explainer().generate_explanation(
-            resume_text=resume_text,
-            job_description=job_description,
-            ranking_result=ranking_result,
-            resume_chunks=resume_chunks,
-            job_chunks=job_chunks
-        )
+        if resume_content is not None:
+            # Server-side fallback extraction is charged as PDF work, to each requester
+            admission_controller.charge(client_id(request), 'pdf')
+            
+            def analyze() -> Tuple[AnalysisResponse, bool]:
+                ocr_guard = SharedOcrGuard()
+                with admission_controller.slot('pdf'):
+                    text = extract_pdf_text(resume_content, ocr_guard)
+                return run_analysis(text, job_description, session_id, explain), ocr_guard.used
+            
+            key = analysis_key('pdf', resume_content, 'job_text', job_description, session_id, explain)
+        else:
+            def analyze() -> Tuple[AnalysisResponse, bool]:
+                return run_analysis(resume_text, job_description, session_id, explain), False
+            
+            key = analysis_key('text', resume_text, 'job_text', job_description, session_id, explain)
         
-        return AnalysisResponse(
-            score=ranking_result['score'],
-            breakdown=ranking_result['breakdown'],
-            overall_assessment=explanation.get('overall_assessment', ''),
-            matched_skills=explanation.get('matched_skills', []),
-            missing_skills=explanation.get('missing_skills', []),
-            strengths=explanation.get('strengths', []),
-            improvement_suggestions=explanation.get('improvement_suggestions', [])
-        )
+        response, ocr_used = await analysis_flights.run(key, lambda: run_in_threadpool(analyze))
+        if ocr_used:
+            admission_controller.debit(client_id(request), 'ocr')
+        return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+
+@router.get("/{analysis_id}/explanation", response_model=AnalysisResponse)
+async def get_analysis_explanation(analysis_id: str, request: Request):
+    """
+    AI explanation for an earlier analysis (e.g. one run with explain=lazy).
+    Generated on first access and stored with the analysis afterwards.
+    """
+    try:
+        # Every requester of a missing explanation pays for the LLM call, before
+        # joining the one call that concurrent first reads share
+        session = await run_in_threadpool(session_store.get, analysis_id)
+        if session is not None and session.get('explanation') is None:
+            admission_controller.charge(client_id(request), 'llm')
+        return await analysis_flights.run(
+            analysis_key('explain', analysis_id),
+            lambda: run_in_threadpool(explain_session, analysis_id)
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Explanation failed: {str(e)}")
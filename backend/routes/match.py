@@ -0,0 +1,210 @@
+from fastapi import APIRouter, UploadFile, File, Form, Header, HTTPException, Request
+from typing import Optional
+import hmac
+import os
+import threading
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from typing import List, Dict
+
+from routes.analyze import (
+    embedding_model, ranking_engine, get_rag_explainer, extract_pdf_text, ocr_guard_for,
+    build_response, AnalysisResponse
+)
+from scoring.job_index import JobIndex
+from processing.pdf_extractor import PDFExtractor
+from processing.chunker import ResumeChunker
+from processing.chunk_batch import ChunkBatch
+from config import settings
+
+router = APIRouter(prefix="/match", tags=["Job Matching"])
+
+job_index = JobIndex()
+_job_index_loaded = False  # Lazy load so startup does not embed every job
+_job_index_load_lock = threading.Lock()
+
+
+def get_job_index() -> JobIndex:
+    global _job_index_loaded
+    if not _job_index_loaded:
+        # Concurrent first requests wait for one load instead of each embedding the file
+        with _job_index_load_lock:
+            if not _job_index_loaded:
+                if settings.JOBS_FILE and os.path.exists(settings.JOBS_FILE):
+                    job_index.load_from_file(settings.JOBS_FILE, embedding_model)
+                # Only mark as loaded once the load succeeded, so a failure is retried
+                _job_index_loaded = True
+    return job_index
+
+
+def _match_resume(resume_chunks: List[Dict], job_matrix):
+    resume_batch = ChunkBatch.from_dicts(resume_chunks)
+    resume_embeddings = embedding_model.encode(resume_batch.texts)
+    return ranking_engine.rank_resume_against_jobs(resume_batch, resume_embeddings, job_matrix)
+
+
+# The index lives in process memory. With several workers, load it here so that
+# gunicorn's preload_app builds it once in the master and every worker shares it.
+if settings.WORKERS > 1:
+    get_job_index()
+
+
+def _explain_resume_against_job(resume_text: str, resume_chunks: List[Dict], job: Dict, job_embedding):
+    job_text = JobIndex.job_text(job)
+    job_chunks = [
+        {'text': job_text, 'section': 'description', 'position': 0},
+        {'text': job_text, 'section': 'requirements', 'position': 1}
+    ]
+    resume_embeddings = embedding_model.encode([chunk['text'] for chunk in resume_chunks])
+    job_embeddings = job_embedding.reshape(1, -1).repeat(len(job_chunks), axis=0)
+
+    ranking_result = ranking_engine.rank_resume(
+        resume_chunks, job_chunks,
+        resume_embeddings, job_embeddings
+    )
+
+    explanation = get_rag_explainer().generate_explanation(
+        resume_text=resume_text,
+        job_description=job_text,
+        ranking_result=ranking_result,
+        resume_chunks=resume_chunks,
+        job_chunks=job_chunks,
+        resume_embeddings=resume_embeddings,
+        job_embeddings=job_embeddings
+    )
+    return ranking_result, explanation
+
+
+class JobInput(BaseModel):
+    id: str
+    title: str = ""
+    description: str
+    requirements: str = ""
+
+
+class JobIndexResponse(BaseModel):
+    jobs_indexed: int
+
+
+class JobMatch(BaseModel):
+    job_id: str
+    title: str
+    score: float
+    breakdown: Dict[str, float]
+
+
+class JobMatchResponse(BaseModel):
+    jobs_considered: int
+    matches: List[JobMatch]
+
+
+async def _resume_chunks_from_request(request: Request, resume: Optional[UploadFile],
+                                      resume_text: Optional[str]):
+    """Extract and chunk a resume given either as a PDF upload or as text"""
+    if resume is not None and resume.filename:
+        if not resume.filename.lower().endswith('.pdf'):
+            raise HTTPException(status_code=400, detail="Resume must be a PDF file")
+        resume_text = await run_in_threadpool(extract_pdf_text, await resume.read(), ocr_guard_for(request))
+    elif not resume_text or not resume_text.strip():
+        raise HTTPException(status_code=400, detail="Please provide either a resume PDF or resume text")
+
+    resume_sections = PDFExtractor.detect_sections(resume_text)
+    resume_chunks = ResumeChunker.chunk_by_sections(resume_sections)
+    if not resume_chunks:
+        resume_chunks = [{
+            'text': resume_text,
+            'section': 'other',
+            'chunk_type': 'full',
+            'position': 0
+        }]
+    return resume_text, resume_chunks
+
+
+@router.put("/jobs", response_model=JobIndexResponse)
+def load_jobs(jobs: List[JobInput], x_admin_token: Optional[str] = Header(None)):
+    """
+    Replace the preloaded job set for every user.
+    All job texts are embedded once, in a single batch.
+    Requires the MATCH_ADMIN_TOKEN in the X-Admin-Token header, and is only
+    available with a single worker; otherwise set JOBS_FILE and restart.
+    """
+    if not settings.MATCH_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Replacing jobs is disabled; set JOBS_FILE instead")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, settings.MATCH_ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    if settings.WORKERS > 1:
+        raise HTTPException(
+            status_code=409,
+            detail="Jobs cannot be replaced at runtime with multiple workers; set JOBS_FILE and restart"
+        )
+    count = get_job_index().load([job.model_dump() for job in jobs], embedding_model)
+    return JobIndexResponse(jobs_indexed=count)
+
+
+@router.post("/jobs", response_model=JobMatchResponse)
+async def match_jobs(
+    request: Request,
+    resume: Optional[UploadFile] = File(None, description="Resume PDF file"),
+    resume_text: Optional[str] = Form(None, description="Resume text content"),
+    top_n: int = Form(10, ge=1, le=100, description="Number of jobs to return")
+):
+    """
+    Find the preloaded jobs that best fit a resume.
+
+    The resume is embedded once and scored against every job in one
+    vectorized pass. No LLM call is made; request an explanation for a
+    single job with /match/jobs/{job_id}/explanation.
+    """
+    index = await run_in_threadpool(get_job_index)
+    jobs, job_matrix = index.snapshot()
+    if not jobs:
+        raise HTTPException(status_code=404, detail="No jobs are loaded for matching")
+
+    try:
+        _, resume_chunks = await _resume_chunks_from_request(request, resume, resume_text)
+        result = await run_in_threadpool(_match_resume, resume_chunks, job_matrix)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Matching failed: {str(e)}")
+
+    matches = [
+        JobMatch(
+            job_id=jobs[i]['id'],
+            title=jobs[i].get('title', ''),
+            score=float(result['scores'][i]),
+            breakdown={key: float(values[i]) for key, values in result['breakdown'].items()}
+        )
+        for i in index.top_n(result['scores'], top_n)
+    ]
+    return JobMatchResponse(jobs_considered=len(jobs), matches=matches)
+
+
+@router.post("/jobs/{job_id}/explanation", response_model=AnalysisResponse)
+async def explain_job_match(
+    job_id: str,
+    request: Request,
+    resume: Optional[UploadFile] = File(None, description="Resume PDF file"),
+    resume_text: Optional[str] = Form(None, description="Resume text content")
+):
+    """
+    Generate the AI explanation for one resume/job pair from a match result.
+    Reuses the job's preloaded embedding.
+    """
+    found = (await run_in_threadpool(get_job_index)).get(job_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} is not loaded")
+    job, job_embedding = found
+
+    try:
+        resume_text, resume_chunks = await _resume_chunks_from_request(request, resume, resume_text)
+        ranking_result, explanation = await run_in_threadpool(
+            _explain_resume_against_job, resume_text, resume_chunks, job, job_embedding
+        )
+
+        return build_response(ranking_result, explanation)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Explanation failed: {str(e)}")
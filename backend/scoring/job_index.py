@@ -0,0 +1,65 @@
+import json
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+class JobIndex:
+    """Preloaded matrix of job embeddings for matching one resume against many jobs"""
+
+    def __init__(self):
+        self.jobs: List[Dict] = []
+        self.matrix: np.ndarray = np.empty((0, 0), dtype=np.float32)
+        self._positions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.jobs)
+
+    @staticmethod
+    def job_text(job: Dict) -> str:
+        """Text embedded for a job: description followed by requirements"""
+        parts = [job.get('description', ''), job.get('requirements', '')]
+        return "\n".join(p for p in parts if p and p.strip())
+
+    def load(self, jobs: List[Dict], embedding_model) -> int:
+        """Embed all jobs in one batch and replace the current index"""
+        jobs = [dict(job, id=str(job['id'])) for job in jobs if self.job_text(job)]
+        if jobs:
+            matrix = np.asarray(embedding_model.encode([self.job_text(job) for job in jobs]),
+                                dtype=np.float32)
+        else:
+            matrix = np.empty((0, 0), dtype=np.float32)
+
+        with self._lock:
+            self.jobs = jobs
+            self.matrix = matrix
+            self._positions = {job['id']: i for i, job in enumerate(jobs)}
+        return len(jobs)
+
+    def load_from_file(self, path: str, embedding_model) -> int:
+        """Load jobs from a JSON list of {id, title, description, requirements}"""
+        with open(path, 'r', encoding='utf-8') as f:
+            jobs = json.load(f)
+        return self.load(jobs, embedding_model)
+
+    def get(self, job_id: str) -> Optional[Tuple[Dict, np.ndarray]]:
+        """Return a job and its embedding, or None if unknown"""
+        with self._lock:
+            position = self._positions.get(str(job_id))
+            if position is None:
+                return None
+            return self.jobs[position], self.matrix[position]
+
+    def snapshot(self) -> Tuple[List[Dict], np.ndarray]:
+        """Consistent view of jobs and matrix for a single scoring pass"""
+        with self._lock:
+            return self.jobs, self.matrix
+
+    @staticmethod
+    def top_n(scores: np.ndarray, n: int) -> np.ndarray:
+        """Indices of the n highest scores, best first"""
+        n = min(n, len(scores))
+        if n <= 0:
+            return np.empty(0, dtype=int)
+        candidates = np.argpartition(-scores, n - 1)[:n]
+        return candidates[np.argsort(-scores[candidates], kind='stable')]
@@ -0,0 +1,126 @@
+import math
+import random
+from typing import Dict, List, Optional, Tuple
+from cache import SharedCache, shared_cache
+
+class KLLSketch:
+    """KLL streaming quantile sketch (Karnin, Lang, Liberty 2016).
+
+    Keeps O(k) values however many are added; rank queries are within about
+    2/k * n of the exact rank with high probability. Sketches built on different
+    workers can be merged.
+    """
+
+    C = 2.0 / 3.0  # Capacity decay between compactor levels
+
+    def __init__(self, k: int = 200):
+        self.k = k
+        self.n = 0
+        self.compactors: List[List[float]] = [[]]
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.compactors) - level - 1
+        return int(math.ceil(self.k * self.C ** depth)) + 1
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(level) for level in range(len(self.compactors)))
+
+    def _size(self) -> int:
+        return sum(len(c) for c in self.compactors)
+
+    def _compress(self) -> None:
+        for level in range(len(self.compactors)):
+            compactor = self.compactors[level]
+            if len(compactor) < self._capacity(level):
+                continue
+            if level + 1 == len(self.compactors):
+                self.compactors.append([])
+            # Promote every other value of the sorted compactor, starting at random
+            compactor.sort()
+            leftover = compactor.pop() if len(compactor) % 2 else None
+            self.compactors[level + 1].extend(compactor[random.getrandbits(1)::2])
+            self.compactors[level] = [leftover] if leftover is not None else []
+            if self._size() < self._max_size():
+                break
+
+    def update(self, value: float) -> None:
+        self.compactors[0].append(float(value))
+        self.n += 1
+        if self._size() >= self._max_size():
+            self._compress()
+
+    def merge(self, other: 'KLLSketch') -> None:
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, values in enumerate(other.compactors):
+            self.compactors[level].extend(values)
+        self.n += other.n
+        while self._size() >= self._max_size():
+            self._compress()
+
+    def rank(self, value: float) -> int:
+        """Approximate number of values <= value"""
+        return sum((2 ** level) * sum(1 for v in values if v <= value)
+                   for level, values in enumerate(self.compactors))
+
+    def percentile(self, value: float) -> float:
+        """Approximate share of values <= value, on a 0-100 scale"""
+        if self.n == 0:
+            return 0.0
+        # Compaction preserves total weight, so n is the weighted size
+        return min(100.0, 100.0 * self.rank(value) / self.n)
+
+    def to_dict(self) -> Dict:
+        return {'k': self.k, 'n': self.n, 'compactors': self.compactors}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'KLLSketch':
+        sketch = cls(data['k'])
+        sketch.n = data['n']
+        sketch.compactors = [list(values) for values in data['compactors']]
+        return sketch
+
+
+class ScorePercentiles:
+    """Per-job score distributions, persisted in the shared cache across workers.
+
+    Sketches are exempt from cache eviction, since a lost sketch cannot be rebuilt.
+    """
+
+    NAMESPACE = 'score_sketches'
+
+    def __init__(self, cache: SharedCache, k: int = 200):
+        self.cache = cache
+        self.k = k
+        cache.keep(self.NAMESPACE)
+
+    def record(self, job_key: str, score: float) -> Tuple[Optional[float], Optional[int]]:
+        """Add a score to the job's distribution; return (percentile, applicants).
+
+        Both are None when the distribution cannot be stored.
+        """
+        if not self.cache.enabled:
+            return None, None
+
+        def add(data: Optional[Dict]) -> Dict:
+            sketch = KLLSketch.from_dict(data) if data else KLLSketch(self.k)
+            sketch.update(score)
+            return sketch.to_dict()
+
+        try:
+            sketch = KLLSketch.from_dict(self.cache.update(self.NAMESPACE, job_key, add))
+        except Exception as e:
+            print(f"Score percentile update failed: {e}")
+            return None, None
+        return sketch.percentile(score), sketch.n
+
+    def lookup(self, job_key: str, score: float) -> Tuple[Optional[float], Optional[int]]:
+        """Percentile of a score without recording it"""
+        data = self.cache.get(self.NAMESPACE, job_key)
+        if not data:
+            return None, None
+        sketch = KLLSketch.from_dict(data)
+        return sketch.percentile(score), sketch.n
+
+
+score_percentiles = ScorePercentiles(shared_cache)
@@ -1,6 +1,9 @@
-from typing import Dict, List
+from typing import Dict, List, Optional, Union
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
+from processing.chunk_batch import ChunkBatch
+
+Chunks = Union[ChunkBatch, List[Dict]]
 
 class RankingEngine:
     """Deterministic, weighted, rule-based scoring engine"""
@@ -25,110 +28,88 @@ class RankingEngine:
         return float(similarity)
     
     @staticmethod
-    def score_skills(resume_chunks: List[Dict], job_chunks: List[Dict], 
-                     resume_embeddings: np.ndarray, job_embeddings: np.ndarray) -> float:
+    def similarity_matrix(resume_embeddings: np.ndarray, job_embeddings: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every resume chunk against every job chunk"""
+        return cosine_similarity(np.atleast_2d(resume_embeddings), np.atleast_2d(job_embeddings))
+    
+    @staticmethod
+    def _mean_similarity(similarities: np.ndarray, resume_mask: np.ndarray,
+                         job_mask: Optional[np.ndarray] = None) -> float:
+        """Average similarity over the selected block, on a 0-100 scale"""
+        block = similarities[resume_mask]
+        if job_mask is not None:
+            block = block[:, job_mask]
+        return float(block.mean() * 100)
+    
+    @staticmethod
+    def _prepare(resume_chunks: Chunks, job_chunks: Chunks, resume_embeddings: np.ndarray,
+                 job_embeddings: np.ndarray, similarities: Optional[np.ndarray]):
+        resume = ChunkBatch.coerce(resume_chunks)
+        job = ChunkBatch.coerce(job_chunks)
+        if similarities is None:
+            similarities = RankingEngine.similarity_matrix(resume_embeddings, job_embeddings)
+        return resume, job, similarities
+    
+    @staticmethod
+    def score_skills(resume_chunks: Chunks, job_chunks: Chunks,
+                     resume_embeddings: np.ndarray, job_embeddings: np.ndarray,
+                     similarities: Optional[np.ndarray] = None) -> float:
         """Score skills match between resume and job"""
-        # Filter skill-related chunks
-        resume_skill_chunks = [c for c in resume_chunks if c['section'] == 'skills']
-        job_skill_chunks = [c for c in job_chunks if 'skill' in c.get('section', '').lower() or 
-                           'requirement' in c.get('section', '').lower()]
+        resume, job, similarities = RankingEngine._prepare(
+            resume_chunks, job_chunks, resume_embeddings, job_embeddings, similarities)
         
-        if not resume_skill_chunks or not job_skill_chunks:
+        resume_mask = resume.masks['skills']
+        job_mask = job.masks['job_skills']
+        if not resume_mask.any() or not job_mask.any():
             return 0.0
         
-        # Get corresponding embeddings
-        resume_skill_indices = [i for i, c in enumerate(resume_chunks) if c['section'] == 'skills']
-        job_skill_indices = [i for i, c in enumerate(job_chunks) if 'skill' in c.get('section', '').lower() or 
-                            'requirement' in c.get('section', '').lower()]
-        
-        resume_skill_emb = resume_embeddings[resume_skill_indices]
-        job_skill_emb = job_embeddings[job_skill_indices]
-        
-        # Calculate average similarity
-        similarities = []
-        for r_emb in resume_skill_emb:
-            for j_emb in job_skill_emb:
-                sim = RankingEngine.calculate_semantic_similarity(r_emb, j_emb)
-                similarities.append(sim)
-        
-        avg_similarity = np.mean(similarities) if similarities else 0.0
-        
-        # Convert to 0-100 scale
-        return float(avg_similarity * 100)
+        return RankingEngine._mean_similarity(similarities, resume_mask, job_mask)
     
     @staticmethod
-    def score_experience(resume_chunks: List[Dict], job_chunks: List[Dict],
-                        resume_embeddings: np.ndarray, job_embeddings: np.ndarray) -> float:
+    def score_experience(resume_chunks: Chunks, job_chunks: Chunks,
+                        resume_embeddings: np.ndarray, job_embeddings: np.ndarray,
+                        similarities: Optional[np.ndarray] = None) -> float:
         """Score experience match"""
-        resume_exp_chunks = [c for c in resume_chunks if c['section'] == 'experience']
-        job_exp_chunks = [c for c in job_chunks if 'experience' in c.get('section', '').lower() or
-                         'responsibility' in c.get('section', '').lower()]
+        resume, job, similarities = RankingEngine._prepare(
+            resume_chunks, job_chunks, resume_embeddings, job_embeddings, similarities)
         
-        if not resume_exp_chunks:
+        resume_mask = resume.masks['experience']
+        if not resume_mask.any():
             return 0.0
         
-        resume_exp_indices = [i for i, c in enumerate(resume_chunks) if c['section'] == 'experience']
-        resume_exp_emb = resume_embeddings[resume_exp_indices]
-        
-        if not job_exp_chunks:
-            # If no specific experience section in job, compare with all job chunks
-            job_exp_emb = job_embeddings
-        else:
-            job_exp_indices = [i for i, c in enumerate(job_chunks) if 'experience' in c.get('section', '').lower() or
-                              'responsibility' in c.get('section', '').lower()]
-            job_exp_emb = job_embeddings[job_exp_indices]
-        
-        similarities = []
-        for r_emb in resume_exp_emb:
-            for j_emb in job_exp_emb:
-                sim = RankingEngine.calculate_semantic_similarity(r_emb, j_emb)
-                similarities.append(sim)
-        
-        avg_similarity = np.mean(similarities) if similarities else 0.0
-        return float(avg_similarity * 100)
+        # If no specific experience section in job, compare with all job chunks
+        job_mask = job.masks['job_experience']
+        return RankingEngine._mean_similarity(similarities, resume_mask,
+                                              job_mask if job_mask.any() else None)
     
     @staticmethod
-    def score_education(resume_chunks: List[Dict], job_chunks: List[Dict],
-                       resume_embeddings: np.ndarray, job_embeddings: np.ndarray) -> float:
+    def score_education(resume_chunks: Chunks, job_chunks: Chunks,
+                       resume_embeddings: np.ndarray, job_embeddings: np.ndarray,
+                       similarities: Optional[np.ndarray] = None) -> float:
         """Score education match"""
-        resume_edu_chunks = [c for c in resume_chunks if c['section'] == 'education']
+        resume, _, similarities = RankingEngine._prepare(
+            resume_chunks, job_chunks, resume_embeddings, job_embeddings, similarities)
         
-        if not resume_edu_chunks:
+        resume_mask = resume.masks['education']
+        if not resume_mask.any():
             return 50.0  # Neutral score if no education section
         
-        resume_edu_indices = [i for i, c in enumerate(resume_chunks) if c['section'] == 'education']
-        resume_edu_emb = resume_embeddings[resume_edu_indices]
-        
         # Compare with all job chunks
-        similarities = []
-        for r_emb in resume_edu_emb:
-            for j_emb in job_embeddings:
-                sim = RankingEngine.calculate_semantic_similarity(r_emb, j_emb)
-                similarities.append(sim)
-        
-        avg_similarity = np.mean(similarities) if similarities else 0.5
-        return float(avg_similarity * 100)
+        return RankingEngine._mean_similarity(similarities, resume_mask)
     
     @staticmethod
-    def score_projects(resume_chunks: List[Dict], job_chunks: List[Dict],
-                      resume_embeddings: np.ndarray, job_embeddings: np.ndarray) -> float:
+    def score_projects(resume_chunks: Chunks, job_chunks: Chunks,
+                      resume_embeddings: np.ndarray, job_embeddings: np.ndarray,
+                      similarities: Optional[np.ndarray] = None) -> float:
         """Score projects match"""
-        resume_proj_chunks = [c for c in resume_chunks if c['section'] == 'projects']
+        resume, _, similarities = RankingEngine._prepare(
+            resume_chunks, job_chunks, resume_embeddings, job_embeddings, similarities)
         
-        if not resume_proj_chunks:
+        resume_mask = resume.masks['projects']
+        if not resume_mask.any():
             return 50.0  # Neutral score if no projects section
         
-        resume_proj_indices = [i for i, c in enumerate(resume_chunks) if c['section'] == 'projects']
-        resume_proj_emb = resume_embeddings[resume_proj_indices]
-        
-        similarities = []
-        for r_emb in resume_proj_emb:
-            for j_emb in job_embeddings:
-                sim = RankingEngine.calculate_semantic_similarity(r_emb, j_emb)
-                similarities.append(sim)
-        
-        avg_similarity = np.mean(similarities) if similarities else 0.5
-        return float(avg_similarity * 100)
+        return RankingEngine._mean_similarity(similarities, resume_mask)
     
     @staticmethod
     def calculate_overall_score(breakdown: Dict[str, float]) -> float:
@@ -137,14 +118,18 @@ class RankingEngine:
         return round(overall, 2)
     
     @staticmethod
-    def rank_resume(resume_chunks: List[Dict], job_chunks: List[Dict],
+    def rank_resume(resume_chunks: Chunks, job_chunks: Chunks,
                    resume_embeddings: np.ndarray, job_embeddings: np.ndarray) -> Dict:
         """Main ranking function"""
+        # Build masks and the similarity matrix once for all section scores
+        resume, job, similarities = RankingEngine._prepare(
+            resume_chunks, job_chunks, resume_embeddings, job_embeddings, None)
+        args = (resume, job, resume_embeddings, job_embeddings, similarities)
         breakdown = {
-            'skills': RankingEngine.score_skills(resume_chunks, job_chunks, resume_embeddings, job_embeddings),
-            'experience': RankingEngine.score_experience(resume_chunks, job_chunks, resume_embeddings, job_embeddings),
-            'education': RankingEngine.score_education(resume_chunks, job_chunks, resume_embeddings, job_embeddings),
-            'projects': RankingEngine.score_projects(resume_chunks, job_chunks, resume_embeddings, job_embeddings)
+            'skills': RankingEngine.score_skills(*args),
+            'experience': RankingEngine.score_experience(*args),
+            'education': RankingEngine.score_education(*args),
+            'projects': RankingEngine.score_projects(*args)
         }
         
         overall_score = RankingEngine.calculate_overall_score(breakdown)
@@ -153,3 +138,39 @@ class RankingEngine:
             'score': overall_score,
             'breakdown': breakdown
         }
+    
+    @staticmethod
+    def rank_resume_against_jobs(resume_chunks: Chunks, resume_embeddings: np.ndarray,
+                                 job_matrix: np.ndarray) -> Dict:
+        """Score one resume against many jobs in a single vectorized pass.
+        
+        Each row of job_matrix is one job's embedding, playing the role of both the
+        description and requirements chunks in rank_resume, so the per-job numbers
+        match what rank_resume would return for that job.
+        """
+        resume_norm = resume_embeddings / np.clip(
+            np.linalg.norm(resume_embeddings, axis=1, keepdims=True), 1e-12, None)
+        job_norm = job_matrix / np.clip(
+            np.linalg.norm(job_matrix, axis=1, keepdims=True), 1e-12, None)
+        similarities = resume_norm @ job_norm.T  # (n_chunks, n_jobs)
+        
+        resume = ChunkBatch.coerce(resume_chunks)
+        n_jobs = job_matrix.shape[0]
+        
+        # Score returned for each section when the resume has no chunks for it
+        empty_scores = {'skills': 0.0, 'experience': 0.0, 'education': 50.0, 'projects': 50.0}
+        
+        breakdown = {}
+        for key, empty_score in empty_scores.items():
+            mask = resume.masks[key]
+            if mask.any():
+                breakdown[key] = similarities[mask].mean(axis=0) * 100
+            else:
+                breakdown[key] = np.full(n_jobs, empty_score)
+        
+        scores = sum(breakdown[key] * RankingEngine.WEIGHTS[key] for key in RankingEngine.WEIGHTS)
+        
+        return {
+            'scores': np.round(scores, 2),
+            'breakdown': breakdown
+        }
@@ -0,0 +1,40 @@
+import uuid
+from typing import Dict, Optional
+from cache import SharedCache, shared_cache
+
+class AnalysisSessionStore:
+    """Per-session analysis state so an edited resume only re-processes what changed"""
+
+    NAMESPACE = 'sessions'
+
+    def __init__(self, cache: SharedCache):
+        self.cache = cache
+
+    @staticmethod
+    def new_id() -> str:
+        return uuid.uuid4().hex
+
+    @staticmethod
+    def chunk_key(chunk: Dict) -> str:
+        """Content hash identifying a chunk across submissions"""
+        return SharedCache.make_key(chunk['section'], chunk['text'])
+
+    def get(self, session_id: str) -> Optional[Dict]:
+        """Return the stored state, or None if the session is unknown or evicted"""
+        return self.cache.get(self.NAMESPACE, session_id)
+
+    def save(self, session_id: str, state: Dict) -> None:
+        self.cache.set(self.NAMESPACE, session_id, state)
+
+    def attach_explanation(self, session_id: str, score: float, explanation: Dict) -> None:
+        """Store a late explanation written at score, unless the session was re-scored meanwhile"""
+        def attach(state: Optional[Dict]) -> Optional[Dict]:
+            if state is None or state['score'] != score:
+                return state
+            return dict(state, explanation=explanation, explained_score=score)
+
+        if self.get(session_id) is not None:
+            self.cache.update(self.NAMESPACE, session_id, attach)
+
+
+session_store = AnalysisSessionStore(shared_cache)
@@ -0,0 +1,177 @@
+import math
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import admission
+from admission import AdmissionController, TokenBucket, per_worker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission.time, 'monotonic', clock)
+    return clock
+
+
+def controller(**overrides):
+    options = dict(
+        costs={'text': 1, 'pdf': 2, 'ocr': 8, 'llm': 4, 'index': 20},
+        concurrency={'text': 2, 'pdf': 1, 'ocr': 1, 'llm': 1, 'index': 1},
+        bucket_capacity=10, bucket_rate=1, stage_retry_after=3
+    )
+    options.update(overrides)
+    return AdmissionController(**options)
+
+
+def test_bucket_takes_and_refills(clock):
+    bucket = TokenBucket(capacity=10, rate=2)
+    assert bucket.take(8) == 0
+    assert bucket.take(4) == pytest.approx(1.0)  # 2 missing tokens at 2 per second
+
+    clock.now += 1
+    assert bucket.take(4) == 0
+
+    clock.now += 100
+    bucket.take(0)
+    assert bucket.tokens == 10  # Refill stops at capacity
+
+
+def test_bucket_never_admits_more_than_capacity(clock):
+    assert TokenBucket(capacity=10, rate=1).take(11) == math.inf
+    assert TokenBucket(capacity=10, rate=0).take(1) == 0
+
+
+def test_bucket_debit_can_overdraw(clock):
+    bucket = TokenBucket(capacity=10, rate=1)
+    bucket.debit(14)
+    assert bucket.take(1) == pytest.approx(5.0)
+
+
+def test_classify_routes():
+    admit = controller()
+    assert admit.classify('POST', '/analyze/resume') == ('pdf', 'llm')
+    assert admit.classify('GET', '/analyze/abc/explanation') is None
+    assert admit.classify('PUT', '/match/jobs') == ('index',)
+    assert admit.classify('GET', '/health') is None
+
+
+@pytest.mark.parametrize('explain, expected', [
+    (None, ('text', 'llm')), ('eager', ('text', 'llm')), ('lazy', ('text',)), ('false', ('text',))
+])
+def test_classify_skips_llm_only_when_explain_defers_it(explain, expected):
+    assert controller().classify('POST', '/analyze/text', explain) == expected
+
+
+@pytest.mark.parametrize('explain', ['false', 'lazy'])
+def test_classify_ignores_explain_on_routes_that_always_call_the_llm(explain):
+    admit = controller()
+    assert admit.classify('POST', '/match/jobs/42/explanation', explain) == ('pdf', 'llm')
+    assert admit.classify('PUT', '/match/jobs', explain) == ('index',)
+
+
+def test_stage_budget_rejects_without_charging(clock):
+    admit = controller()
+    first = admit.try_acquire('a', ('pdf',))
+    assert first.admitted
+
+    busy = admit.try_acquire('b', ('pdf',))
+    assert not busy.admitted
+    assert busy.retry_after == 3
+    assert admit.rejected == {'pdf': 1}
+
+    admit.release(first.stages)
+    assert admit.try_acquire('b', ('pdf',)).admitted
+    assert admit._bucket('b').tokens == 8  # The rejected attempt was free
+
+
+def test_rate_limit_is_per_client(clock):
+    admit = controller()
+    for _ in range(2):
+        admit.release(admit.try_acquire('a', ('llm',)).stages)
+
+    limited = admit.try_acquire('a', ('llm',))
+    assert not limited.admitted
+    assert limited.retry_after == 2  # 2 tokens left, 4 needed, 1 per second
+    assert admit.active == {'llm': 0}
+    assert admit.try_acquire('b', ('llm',)).admitted
+
+
+def test_client_buckets_are_bounded(clock):
+    admit = controller(max_clients=2)
+    for client in ('a', 'b', 'c'):
+        admit.try_acquire(client, ())
+    assert list(admit._buckets) == ['b', 'c']
+
+
+def test_disabled_admits_everything(clock):
+    admit = controller(enabled=False)
+    for _ in range(5):
+        assert admit.try_acquire('a', ('index',)).admitted
+    admit.charge('a', 'index')
+    with admit.slot('ocr'), admit.slot('ocr'):
+        pass
+
+
+def test_stage_raises_429_with_retry_after(clock):
+    admit = controller()
+    with admit.stage('a', 'ocr'):
+        with pytest.raises(HTTPException) as busy:
+            with admit.stage('b', 'ocr'):
+                pass
+    assert busy.value.status_code == 429
+    assert busy.value.headers == {'Retry-After': '3'}
+    assert admit.active == {'ocr': 0}
+
+
+def test_shared_work_slot_and_per_requester_charges(clock):
+    admit = controller()
+    with admit.slot('ocr'):
+        with pytest.raises(HTTPException):
+            with admit.slot('ocr'):
+                pass
+    assert admit.active == {'ocr': 0}
+    assert 'a' not in admit._buckets  # Slots charge nobody
+
+    admit.charge('a', 'llm')
+    admit.charge('a', 'llm')
+    with pytest.raises(HTTPException) as limited:
+        admit.charge('a', 'llm')
+    assert limited.value.status_code == 429
+    admit.charge('b', 'llm')  # Another client is unaffected
+
+    admit.debit('b', 'ocr')
+    assert admit._bucket('b').tokens == -2
+
+
+def test_per_worker_split():
+    assert per_worker(16, 4) == 4
+    assert per_worker(8, 3) == 2
+    assert per_worker(1, 4) == 1
+    assert per_worker(8, 0) == 8
+
+
+def request(forwarded_for=None, peer='203.0.113.9'):
+    headers = {'x-forwarded-for': forwarded_for} if forwarded_for else {}
+    return SimpleNamespace(headers=headers, client=SimpleNamespace(host=peer))
+
+
+@pytest.mark.parametrize('hops, forwarded_for, expected', [
+    (0, '198.51.100.1, 10.0.0.2', '203.0.113.9'),
+    (1, None, '203.0.113.9'),
+    (1, '198.51.100.1, 10.0.0.2', '10.0.0.2'),
+    (2, 'spoofed, 198.51.100.1, 10.0.0.2', '198.51.100.1'),
+    (2, '198.51.100.1', '198.51.100.1'),
+])
+def test_client_id_trusts_only_proxy_entries(monkeypatch, hops, forwarded_for, expected):
+    monkeypatch.setattr(admission.settings, 'TRUSTED_PROXY_HOPS', hops)
+    assert admission.client_id(request(forwarded_for)) == expected
@@ -0,0 +1,107 @@
+import os
+import sys
+import types
+
+import numpy as np
+
+import ingest
+from processing.chunk_store import ChunkStore
+from processing.pdf_extractor import PDFExtractor
+
+DIM = 4
+
+
+def document(doc_hash, n_chunks=2):
+    return {
+        'doc_hash': doc_hash,
+        'source': f"{doc_hash}.pdf",
+        'chunks': [{'text': f"{doc_hash} chunk {i}", 'section': 'skills', 'position': i}
+                   for i in range(n_chunks)]
+    }
+
+
+def embeddings_for(documents):
+    rows = sum(len(doc['chunks']) for doc in documents)
+    return np.arange(rows * DIM, dtype=np.float32).reshape(rows, DIM)
+
+
+def committed_docs(store):
+    return {record['doc_hash'] for records, _ in store.iter_shards() for record in records}
+
+
+def test_append_and_read_back(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    documents = [document('a'), document('b', 3)]
+    store.append(documents, embeddings_for(documents))
+
+    assert store.ingested_hashes() == {'a', 'b'}
+    [(records, matrix)] = list(store.iter_shards())
+    assert len(records) == 5
+    assert matrix.shape == (5, DIM)
+    assert [r['row'] for r in records] == list(range(5))
+
+
+def test_torn_manifest_line_does_not_hide_next_commit(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.append([document('a')], embeddings_for([document('a')]))
+    # Crash while committing 'b': its shard exists but its manifest line is cut short
+    store.append([document('b')], embeddings_for([document('b')]))
+    manifest = os.path.join(str(tmp_path), ChunkStore.MANIFEST)
+    with open(manifest, 'rb+') as f:
+        f.seek(-10, os.SEEK_END)
+        f.truncate()
+
+    assert store.ingested_hashes() == {'a'}
+
+    store.append([document('c')], embeddings_for([document('c')]))
+    assert store.ingested_hashes() == {'a', 'c'}
+    assert committed_docs(store) == {'a', 'c'}
+
+
+def test_orphan_shard_is_ignored_and_not_overwritten(tmp_path):
+    store = ChunkStore(str(tmp_path))
+    store.append([document('a')], embeddings_for([document('a')]))
+    # Crash after the shard was written but before its manifest commit
+    manifest = os.path.join(str(tmp_path), ChunkStore.MANIFEST)
+    with open(manifest, 'rb') as f:
+        committed = f.read()
+    orphan = store.append([document('b')], embeddings_for([document('b')]))
+    with open(manifest, 'wb') as f:
+        f.write(committed)
+
+    assert store.ingested_hashes() == {'a'}
+    assert committed_docs(store) == {'a'}
+    assert store.append([document('b')], embeddings_for([document('b')])) != orphan
+    assert committed_docs(store) == {'a', 'b'}
+
+
+def test_ingest_skips_files_already_in_store(tmp_path, monkeypatch):
+    class FakeEmbeddingModel:
+        def __init__(self, name):
+            pass
+
+        def encode(self, texts):
+            return np.ones((len(texts), DIM), dtype=np.float32)
+
+    model_manager = types.ModuleType('embeddings.model_manager')
+    model_manager.EmbeddingModel = FakeEmbeddingModel
+    monkeypatch.setitem(sys.modules, 'embeddings', types.ModuleType('embeddings'))
+    monkeypatch.setitem(sys.modules, 'embeddings.model_manager', model_manager)
+    # Worker processes are forked, so they see the patched extractor
+    monkeypatch.setattr(PDFExtractor, 'extract_text', staticmethod(lambda path, ocr_guard=None: "Skills\nPython, SQL"))
+
+    source, store_dir = tmp_path / 'resumes', str(tmp_path / 'store')
+    source.mkdir()
+    for name in ('one', 'two'):
+        (source / f"{name}.pdf").write_bytes(f"%PDF {name}".encode())
+
+    ingest.ingest(str(source), store_dir, workers=1, batch_chunks=1)
+    first_run = ChunkStore(store_dir).ingested_hashes()
+    assert len(first_run) == 2
+
+    (source / 'three.pdf').write_bytes(b"%PDF three")
+    ingest.ingest(str(source), store_dir, workers=1, batch_chunks=1)
+
+    store = ChunkStore(store_dir)
+    assert len(store.ingested_hashes()) == 3
+    assert len(store._manifest()) == 3  # Nothing from the first run was ingested again
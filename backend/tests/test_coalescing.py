@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from coalescing import SingleFlight
+
+
+class Work:
+    """Counts calls and blocks each one until released"""
+
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.result = result
+        self.error = error
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_duplicates_share_one_call():
+    async def scenario():
+        flights, work = SingleFlight(), Work(result={'score': 71.5})
+        waiters = [asyncio.ensure_future(flights.run('key', work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        work.release.set()
+        return flights, work, await asyncio.gather(*waiters)
+
+    flights, work, results = asyncio.run(scenario())
+    assert work.calls == 1
+    assert results == [{'score': 71.5}] * 3
+    assert flights.stats() == {'started': 1, 'coalesced': 2, 'failed': 0, 'in_flight': 0}
+
+
+def test_different_keys_run_separately():
+    async def scenario():
+        flights, work = SingleFlight(), Work(result=1)
+        waiters = [asyncio.ensure_future(flights.run(key, work)) for key in ('a', 'b')]
+        await asyncio.sleep(0)
+        work.release.set()
+        await asyncio.gather(*waiters)
+        return work
+
+    assert asyncio.run(scenario()).calls == 2
+
+
+def test_error_reaches_every_waiter():
+    async def scenario():
+        flights, work = SingleFlight(), Work(error=ValueError("extraction failed"))
+        waiters = [asyncio.ensure_future(flights.run('key', work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        work.release.set()
+        return flights, work, await asyncio.gather(*waiters, return_exceptions=True)
+
+    flights, work, results = asyncio.run(scenario())
+    assert work.calls == 1
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flights.stats()['failed'] == 1
+
+
+def test_finished_key_runs_again():
+    async def scenario():
+        flights, work = SingleFlight(), Work(result=1)
+        work.release.set()
+        await flights.run('key', work)
+        await flights.run('key', work)
+        return work
+
+    assert asyncio.run(scenario()).calls == 2
+
+
+def test_cancelled_waiter_leaves_shared_work_running():
+    async def scenario():
+        flights, work = SingleFlight(), Work(result='done')
+        first = asyncio.ensure_future(flights.run('key', work))
+        second = asyncio.ensure_future(flights.run('key', work))
+        await asyncio.sleep(0)
+
+        first.cancel()  # e.g. the first client disconnected
+        await asyncio.sleep(0)
+        work.release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return work, await second
+
+    work, result = asyncio.run(scenario())
+    assert work.calls == 1
+    assert result == 'done'
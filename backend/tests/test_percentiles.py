@@ -0,0 +1,120 @@
+import bisect
+import random
+
+import pytest
+
+from cache import SharedCache
+from scoring.percentiles import KLLSketch, ScorePercentiles
+
+K = 200
+TOLERANCE = 100.0 * 2 / K  # Percentile points; KLL rank error is about 2/k * n
+
+
+def exact_percentile(sorted_values, value):
+    return 100.0 * bisect.bisect_right(sorted_values, value) / len(sorted_values)
+
+
+def max_error(sketch, values):
+    sorted_values = sorted(values)
+    probes = sorted_values[::max(1, len(sorted_values) // 500)]
+    return max(abs(sketch.percentile(v) - exact_percentile(sorted_values, v)) for v in probes)
+
+
+def uniform_scores(rng, n):
+    return [rng.uniform(0, 100) for _ in range(n)]
+
+
+def clustered_scores(rng, n):
+    # Most applicants cluster around a typical score, with a long tail of strong fits
+    return [min(100.0, max(0.0, rng.gauss(55, 8) if rng.random() < 0.9 else rng.gauss(85, 4)))
+            for _ in range(n)]
+
+
+@pytest.fixture(autouse=True)
+def seeded():
+    # Compaction picks odd or even values at random
+    random.seed(1)
+
+
+@pytest.mark.parametrize('make_scores', [uniform_scores, clustered_scores])
+def test_percentile_close_to_exact(make_scores):
+    values = make_scores(random.Random(7), 20000)
+    sketch = KLLSketch(K)
+    for value in values:
+        sketch.update(value)
+
+    assert sketch.n == len(values)
+    assert sum(len(c) for c in sketch.compactors) < len(values) // 10
+    assert max_error(sketch, values) <= TOLERANCE
+
+
+def test_small_stream_is_exact():
+    values = uniform_scores(random.Random(3), 50)
+    sketch = KLLSketch(K)
+    for value in values:
+        sketch.update(value)
+
+    assert max_error(sketch, values) == 0
+
+
+@pytest.mark.parametrize('make_scores', [uniform_scores, clustered_scores])
+def test_merge_close_to_exact(make_scores):
+    rng = random.Random(11)
+    first, second = make_scores(rng, 12000), make_scores(rng, 8000)
+    merged, other = KLLSketch(K), KLLSketch(K)
+    for value in first:
+        merged.update(value)
+    for value in second:
+        other.update(value)
+    merged.merge(other)
+
+    assert merged.n == len(first) + len(second)
+    assert max_error(merged, first + second) <= TOLERANCE
+
+
+def test_round_trip_through_dict():
+    sketch = KLLSketch(K)
+    for value in uniform_scores(random.Random(5), 3000):
+        sketch.update(value)
+
+    restored = KLLSketch.from_dict(sketch.to_dict())
+    assert restored.n == sketch.n
+    assert restored.percentile(50.0) == sketch.percentile(50.0)
+
+
+def test_record_and_lookup(tmp_path):
+    percentiles = ScorePercentiles(SharedCache(str(tmp_path / 'cache.sqlite3')), k=K)
+    for score in (20.0, 40.0, 60.0, 80.0):
+        percentiles.record('job', score)
+
+    assert percentiles.record('job', 50.0) == (60.0, 5)
+    assert percentiles.lookup('job', 80.0) == (100.0, 5)
+    assert percentiles.lookup('other job', 80.0) == (None, None)
+
+
+def test_sketches_survive_eviction(tmp_path):
+    cache = SharedCache(str(tmp_path / 'cache.sqlite3'), max_entries=10)
+    percentiles = ScorePercentiles(cache, k=K)
+    percentiles.record('job', 70.0)
+    cache.set_many('llm', {str(i): i for i in range(SharedCache.EVICT_EVERY)})
+
+    assert cache.get('llm', '0') is None
+    assert percentiles.lookup('job', 70.0) == (100.0, 1)
+
+
+def test_disabled_cache_reports_nothing(tmp_path):
+    percentiles = ScorePercentiles(SharedCache(str(tmp_path / 'cache.sqlite3'), enabled=False), k=K)
+
+    assert percentiles.record('job', 70.0) == (None, None)
+    assert percentiles.lookup('job', 70.0) == (None, None)
+
+
+def test_failed_update_reports_nothing(tmp_path):
+    cache = SharedCache(str(tmp_path / 'cache.sqlite3'))
+    percentiles = ScorePercentiles(cache, k=K)
+
+    def fail(namespace, key, func):
+        raise RuntimeError("database is locked")
+
+    cache.update = fail
+    assert percentiles.record('job', 70.0) == (None, None)
@@ -3,6 +3,7 @@
 import { useState, useRef } from 'react';
 import { Upload, FileText, Sparkles, TrendingUp, CheckCircle, AlertCircle, Loader2, FileUp } from 'lucide-react';
 import apiClient from '@/lib/api';
+import { extractPdfText, hasTextLayer } from '@/lib/pdfText';
 
 interface AnalysisResult {
     score: number;
@@ -76,16 +77,42 @@ export default function HomePage() {
         setResult(null);
 
         try {
+            // Read the PDFs in the browser when possible; the server only parses them as a fallback
+            const resumePdf = await extractPdfText(resumeFile).catch(() => null);
+            const jobPdf = !useTextInput && jobDescriptionFile
+                ? await extractPdfText(jobDescriptionFile).catch(() => null)
+                : null;
+            // A scanned job PDF goes to /analyze/resume instead, where the server can OCR it
+            const jobPdfText = jobPdf && hasTextLayer(jobPdf.pageCharCounts) ? jobPdf.text.trim() : '';
+            const jobText = useTextInput ? jobDescriptionText : jobPdfText;
+
             const formData = new FormData();
-            formData.append('resume', resumeFile);
-            
-            if (useTextInput) {
-                formData.append('job_description_text', jobDescriptionText);
-            } else if (jobDescriptionFile) {
-                formData.append('job_description_file', jobDescriptionFile);
+            let endpoint = '/analyze/resume';
+
+            if (resumePdf && jobText) {
+                endpoint = '/analyze/text';
+                formData.append('resume_text', resumePdf.text);
+                formData.append('resume_sha256', resumePdf.sha256);
+                formData.append('page_char_counts', JSON.stringify(resumePdf.pageCharCounts));
+                formData.append('job_description', jobText);
+                if (jobPdf && !useTextInput) {
+                    formData.append('job_page_char_counts', JSON.stringify(jobPdf.pageCharCounts));
+                }
+                // Scanned or empty PDF: the server needs the file to extract (and OCR) it
+                if (!hasTextLayer(resumePdf.pageCharCounts)) {
+                    formData.append('resume_file', resumeFile);
+                }
+            } else {
+                formData.append('resume', resumeFile);
+                
+                if (useTextInput) {
+                    formData.append('job_description_text', jobDescriptionText);
+                } else if (jobDescriptionFile) {
+                    formData.append('job_description_file', jobDescriptionFile);
+                }
             }
 
-            const response = await apiClient.post<AnalysisResult>('/analyze/resume', formData, {
+            const response = await apiClient.post<AnalysisResult>(endpoint, formData, {
                 headers: {
                     'Content-Type': 'multipart/form-data',
                 },
@@ -0,0 +1,62 @@
+import type { PdfTextRequest, PdfTextResponse } from '@/workers/pdfText.worker';
+
+export interface PdfTextResult {
+    text: string;
+    pageCharCounts: number[];
+    sha256: string;
+}
+
+// Keep in sync with CLIENT_TEXT_MIN_PAGE_CHARS / CLIENT_TEXT_MIN_COVERAGE in the backend
+const MIN_PAGE_CHARS = 50;
+const MIN_COVERAGE = 0.8;
+
+let worker: Worker | null = null;
+let nextId = 0;
+const pending = new Map<number, (response: PdfTextResponse) => void>();
+
+const getWorker = () => {
+    if (!worker) {
+        worker = new Worker(new URL('../workers/pdfText.worker.ts', import.meta.url));
+        worker.onmessage = (event: MessageEvent<PdfTextResponse>) => {
+            pending.get(event.data.id)?.(event.data);
+            pending.delete(event.data.id);
+        };
+        worker.onerror = () => {
+            // Fail everything in flight; a fresh worker is created on next use
+            pending.forEach((resolve, id) => resolve({ id, ok: false, error: 'PDF worker crashed' }));
+            pending.clear();
+            worker?.terminate();
+            worker = null;
+        };
+    }
+    return worker;
+};
+
+/** Extract a PDF's text layer in a Web Worker, off the main thread. */
+export const extractPdfText = async (file: File): Promise<PdfTextResult> => {
+    if (typeof Worker === 'undefined') {
+        throw new Error('Web Workers are not supported');
+    }
+    const data = await file.arrayBuffer();
+    const id = nextId++;
+    const response = await new Promise<PdfTextResponse>((resolve) => {
+        pending.set(id, resolve);
+        const request: PdfTextRequest = { id, data };
+        getWorker().postMessage(request, [data]);
+    });
+    if (!response.ok) {
+        throw new Error(response.error || 'PDF text extraction failed');
+    }
+    return {
+        text: response.text || '',
+        pageCharCounts: response.pageCharCounts || [],
+        sha256: response.sha256 || '',
+    };
+};
+
+/** True when enough pages have real text; otherwise the PDF is likely scanned or empty. */
+export const hasTextLayer = (pageCharCounts: number[]) => {
+    if (pageCharCounts.length === 0) return false;
+    const pagesWithText = pageCharCounts.filter((count) => count >= MIN_PAGE_CHARS).length;
+    return pagesWithText / pageCharCounts.length >= MIN_COVERAGE;
+};
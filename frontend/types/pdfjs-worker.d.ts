@@ -0,0 +1 @@
+declare module 'pdfjs-dist/build/pdf.worker.js';
@@ -0,0 +1,60 @@
+/// <reference lib="webworker" />
+import * as pdfjsLib from 'pdfjs-dist';
+import * as pdfjsWorker from 'pdfjs-dist/build/pdf.worker.js';
+
+// We are already off the main thread, so let pdf.js run its worker code in this thread
+(self as any).pdfjsWorker = pdfjsWorker;
+
+export interface PdfTextRequest {
+    id: number;
+    data: ArrayBuffer;
+}
+
+export interface PdfTextResponse {
+    id: number;
+    ok: boolean;
+    text?: string;
+    pageCharCounts?: number[];
+    sha256?: string;
+    error?: string;
+}
+
+const toHex = (buffer: ArrayBuffer) =>
+    Array.from(new Uint8Array(buffer))
+        .map((b) => b.toString(16).padStart(2, '0'))
+        .join('');
+
+self.onmessage = async (event: MessageEvent<PdfTextRequest>) => {
+    const { id, data } = event.data;
+    try {
+        // Hash first: pdf.js takes ownership of the buffer it is given
+        const sha256 = toHex(await crypto.subtle.digest('SHA-256', data));
+
+        const pdf = await pdfjsLib.getDocument({
+            data: new Uint8Array(data),
+            isEvalSupported: false,
+            disableFontFace: true,
+            useSystemFonts: false,
+        }).promise;
+
+        const pages: string[] = [];
+        const pageCharCounts: number[] = [];
+        for (let i = 1; i <= pdf.numPages; i++) {
+            const page = await pdf.getPage(i);
+            const content = await page.getTextContent();
+            const pageText = content.items
+                .map((item: any) => ('str' in item ? item.str : ''))
+                .join(' ');
+            pages.push(pageText);
+            pageCharCounts.push(pageText.replace(/\s/g, '').length);
+            page.cleanup();
+        }
+        await pdf.destroy();
+
+        const response: PdfTextResponse = { id, ok: true, text: pages.join('\n'), pageCharCounts, sha256 };
+        self.postMessage(response);
+    } catch (err: any) {
+        const response: PdfTextResponse = { id, ok: false, error: err?.message || String(err) };
+        self.postMessage(response);
+    }
+};